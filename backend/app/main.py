@@ -1,41 +1,85 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-
-from sentence_transformers import SentenceTransformer
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, or_
 
 from .database import SessionLocal
-from .schemas import PaperIDResponse, UpdateStatus, UpdateFavouriteStatus, PaperOutput, AuthorOutput, PaperInput, CollectionOutput, PaperCollectionUpdate, UploadRequest
+from .schemas import PaperIDResponse, UpdateStatus, UpdateFavouriteStatus, PaperOutput, PaperPage, AuthorOutput, PaperInput, CollectionOutput, PaperCollectionUpdate, UploadRequest, BulkImportRequest
 from .models import Paper, Author, PaperAuthors, Tags, PaperTags, Collection, PaperCollections
 from .utils.keyword_extraction import extract_keyword
-from .utils.chatbot import answer_user_query
-
-from typing import List, Dict, Any, Optional
-import xml.etree.ElementTree as ET
+from .utils.chatbot import answer_user_query, answer_cache, stream_answer, context_crew, CHATBOT_LLM
+from .utils.vector_store import VectorStore
+from .utils.bulk_import import BulkImporter
+from .utils.name_lookup import resolve_name_ids, link_names
+from .utils.grobid_client import GrobidClient, GrobidError, GrobidBusyError
+from .utils.pdf_text import extract_chunks_from_pdf
+from .utils.tei_text import parse_tei, extract_chunks_from_tei
+from .utils.chunk_store import provenance_array
+from .utils.query_batcher import QueryEmbeddingBatcher
+from .utils.lru_cache import LRUCache, normalize_query
+from .utils.worker_pool import WorkerPool, PoolBusyError, INGEST_PARSE_MODE, INGEST_PARSE_WORKERS, INGEST_ENCODE_WORKERS
+from .utils.index_factory import index_kind
+from .utils.lazy import LazyResource
+from .utils.tei_cache import TeiCache
+from .utils.paper_search import parse_search_query, search_filters, rank_papers, uses_fulltext
+from .utils.paper_vectors import PaperVectors, paper_text
+
+from typing import List, Dict, Any, Optional, Set, Tuple
 import os
-import requests
 import hashlib
-import fitz
 import numpy as np
 import faiss
-import re
 import pickle
+import shutil
+import tempfile
+import base64
+import json
+import time
+import threading
+from datetime import date, datetime
 
 GROBID_URL = "http://localhost:8070/api/processFulltextDocument" 
+grobid_client = GrobidClient(GROBID_URL)
+# GROBID output by PDF hash, so re-uploads and retries skip the GROBID call
+tei_cache = TeiCache()
 app = FastAPI()
 
+VECTOR_STORE_DIR = "vector_store"
+# One of flat, ivf_flat, hnsw, ivf_pq, sq_fp16, sq_int8 (see utils/index_factory.py)
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "flat")
+
+# Paper-level title + abstract vectors for similar-paper and semantic library search
+PAPER_VECTOR_DIR = "paper_vectors"
+PAPER_VECTOR_INDEX_MODE = os.getenv("PAPER_VECTOR_INDEX_MODE", "hnsw")
+
+# Pre-WAL storage files, only read once to migrate into VECTOR_STORE_DIR
 FAISS_INDEX_PATH = "faiss_index.bin"
 METADATA_PATH = "metadata_store.pkl"
 VECTOR_ID_PATH = "current_vector_id.txt"
 
-model = SentenceTransformer('all-mpnet-base-v2')
+EMBEDDING_MODEL_NAME = 'all-mpnet-base-v2'
+# Load the models in a background thread on startup rather than on first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "on").lower() not in ("0", "off", "false", "no")
+
+def load_embedding_model():
+    # sentence_transformers pulls in torch, which is most of the import time
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+embedding_model = LazyResource("embedding model", load_embedding_model)
 dimension = 768
-index = faiss.IndexFlatIP(dimension) 
-metadata_store = {}
-current_vector_id = 0
+vector_store_loaded = False
+startup_timings: Dict[str, Optional[float]] = {"vector_store_seconds": None, "warmup_seconds": None}
+vector_store = VectorStore(dimension, VECTOR_STORE_DIR, VECTOR_INDEX_MODE)
+paper_vector_store = VectorStore(dimension, PAPER_VECTOR_DIR, PAPER_VECTOR_INDEX_MODE)
+
+# CPU-heavy ingest stages run here rather than on the event loop
+parse_pool = WorkerPool("pdf-parse", INGEST_PARSE_MODE, INGEST_PARSE_WORKERS)
+encode_pool = WorkerPool("encode", "thread", INGEST_ENCODE_WORKERS)
 
 UPLOAD_PATH = "C:/Users/ar041/ai-paper-system/uploads"
 UPLOAD_DIR = "uploads"
@@ -47,6 +91,11 @@ app.mount("/uploads", StaticFiles(directory=UPLOAD_PATH), name="uploads")
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Uploads are copied to disk this many bytes at a time and refused past UPLOAD_MAX_MB
+UPLOAD_MAX_MB = float(os.getenv("UPLOAD_MAX_MB", 100))
+UPLOAD_MAX_BYTES = int(UPLOAD_MAX_MB * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"], 
@@ -63,98 +112,109 @@ def get_db():
     finally:
         db.close()
 
-def parse_tei(xml_data):
-    root = ET.fromstring(xml_data)
-    ns = {"tei": "http://www.tei-c.org/ns/1.0"}
-
-    # Extract title
-    title_el = root.find(".//tei:titleStmt/tei:title", ns)
-    title = title_el.text if title_el is not None else None
-
-    # Extract abstract
-    abstract_el = root.find(".//tei:profileDesc/tei:abstract", ns)
-    abstract = (
-        "".join(abstract_el.itertext()).strip() if abstract_el is not None else None
-    )
-
-    # Extract keywords
-    keywords = []
-    for kw_el in root.findall(".//tei:profileDesc/tei:textClass/tei:keywords/tei:term", ns):
-        if kw_el.text:
-            keywords.append(kw_el.text.strip())
-
-    # Extract authors
-    authors = []
-    for author_el in root.findall(".//tei:sourceDesc//tei:author", ns):
-        name_el = author_el.find("tei:persName", ns)
-        forenames = name_el.findall("tei:forename", ns) if name_el is not None else []
-        surname_el = name_el.find("tei:surname", ns) if name_el is not None else None
-
-        full_name = " ".join([fn.text for fn in forenames if fn.text]) + (
-            " " + surname_el.text if surname_el is not None else ""
-        )
-
-        authors.append({
-            "name": full_name.strip()
-        })
-
-    # Extract publication date
-    pub_date_el = root.find(".//tei:sourceDesc//tei:date", ns)
-    pub_date = pub_date_el.get("when") if pub_date_el is not None else None
-
-    return {
-        "title": title,
-        "abstract": abstract,
-        "keywords": keywords,
-        "authors": authors,
-        "publication_date": pub_date
-    } 
-
+async def save_upload(file: UploadFile, directory: str) -> Tuple[str, str, int]:
+    """
+    Copy an upload to a temporary file in `directory` in UPLOAD_CHUNK_BYTES
+    pieces, hashing as the bytes go by, so memory use does not grow with the
+    PDF. Returns (temporary path, SHA-256 hex digest, size in bytes); rejects
+    uploads over UPLOAD_MAX_MB with a 413.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=413,
+                                        detail=f"PDF is larger than the {UPLOAD_MAX_MB:g} MB upload limit")
+                sha256.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, sha256.hexdigest(), size
 
 @app.post("/extract/")
 async def extract_fulltext(file: UploadFile = File(...)):
 
-    # Save uploaded file
-    tmp_path = os.path.join(UPLOAD_DIR, file.filename)
-    file_bytes = await file.read()
-    with open(tmp_path, "wb") as out:
-        out.write(file_bytes)
+    # Stream the upload to disk, computing its hash on the way
+    tmp_path, pdf_hash, _ = await save_upload(file, UPLOAD_DIR)
 
-    # Compute hash
-    pdf_hash = hashlib.sha256(file_bytes).hexdigest()
+    # Nothing to extract for a PDF that is already in the library
+    existing_paper_id = await run_in_threadpool(find_paper_id_by_hash, pdf_hash)
+    if existing_paper_id is not None:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=409, detail={
+            "message": "This paper already exists in the system.",
+            "paper_id": existing_paper_id
+        })
 
-    # Send to Grobid
-    try:
-        resp = requests.post(
-            GROBID_URL,
-            files={"input": ("filename", file_bytes, "application/pdf")},
-            timeout=120
-        )
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=str(e))
+    # Keep the uploaded file
+    pdf_path = os.path.join(UPLOAD_DIR, file.filename)
+    os.replace(tmp_path, pdf_path)
+
+    # Same PDF extracted before: reuse the parsed metadata (and its keywords)
+    cached = await run_in_threadpool(tei_cache.get_result, pdf_hash)
+    if cached is not None:
+        return JSONResponse(content={
+            **cached,
+            "pdf_hash": pdf_hash,
+            "pdf_filename": file.filename,
+            "cache_hit": True
+        })
 
-    if not resp.ok:
-        raise HTTPException(status_code=502, detail="Grobid error: " + resp.text[:200])
+    tei = await run_in_threadpool(tei_cache.get_tei, pdf_hash)
+    cache_hit = tei is not None
+    if tei is None:
+        # Send to Grobid without blocking the event loop
+        try:
+            tei = await grobid_client.process_fulltext(file.filename, pdf_path)
+        except GrobidBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except GrobidError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+        await run_in_threadpool(tei_cache.put_tei, pdf_hash, tei)
 
     # Parse TEI‑XML
-    data = parse_tei(resp.content)
+    data = await run_in_threadpool(parse_tei, tei)
 
-    # If keywords are missing, extract from abstract
+    # If keywords are missing, extract from abstract (a blocking LLM call)
+    keywords_ok = True
     if not data.get("keywords") and data.get("abstract"):
         try:
-            extracted = extract_keyword(data["abstract"])
+            extracted = await run_in_threadpool(extract_keyword, data["abstract"])
             if extracted:
                 data["keywords"] = extracted
         except Exception as e:
+            keywords_ok = False
             print("Keyword extraction failed:", e)
+    if keywords_ok:
+        await run_in_threadpool(tei_cache.put_result, pdf_hash, data)
 
     # Return full response
     return JSONResponse(content={
         **data,
         "pdf_hash": pdf_hash,
-        "pdf_filename": file.filename
+        "pdf_filename": file.filename,
+        "cache_hit": cache_hit
     })
 
+def find_paper_id_by_hash(pdf_hash: str) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        return db.query(Paper.paper_id).filter(Paper.pdf_hash == pdf_hash).scalar()
+    finally:
+        db.close()
+
+def find_pdf_hash_by_id(paper_id: int) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        return db.query(Paper.pdf_hash).filter(Paper.paper_id == paper_id).scalar()
+    finally:
+        db.close()
+
 
 @app.post("/add-paper/", response_model=PaperIDResponse)
 async def add_paper(payload: PaperInput, db: Session = Depends(get_db)):
@@ -184,64 +244,25 @@ async def add_paper(payload: PaperInput, db: Session = Depends(get_db)):
             isFavourite=False
         )
         db.add(paper)
+        db.flush()
+
+        # Resolve every author, tag and collection name with one upsert + select per
+        # entity type and link them, all in the paper's transaction
+        author_names = [a.name.strip() for a in payload.authors if a.name and a.name.strip()]
+        tag_names = [kw.strip().lower() for kw in payload.keywords if kw and kw.strip()]
+        collection_names = [c.strip() for c in payload.collections if c and c.strip()]
+
+        author_ids = resolve_name_ids(db, Author, author_names)
+        tag_ids = resolve_name_ids(db, Tags, tag_names)
+        collection_ids = resolve_name_ids(db, Collection, collection_names)
+
+        link_names(db, PaperAuthors, "author_id", paper.paper_id, author_ids.values())
+        link_names(db, PaperTags, "tag_id", paper.paper_id, tag_ids.values())
+        link_names(db, PaperCollections, "collection_id", paper.paper_id, collection_ids.values())
+
+        response = {"paper_id": paper.paper_id,
+                    "pdf_path" : paper.pdf_path}
         db.commit()
-        db.refresh(paper)
-        
-        # Add authors and PaperAuthors
-        try:
-            for author_data in payload.authors:
-                if not author_data.name or not author_data.name.strip():
-                    continue  # Skip empty author names
-                    
-                author = db.query(Author).filter(Author.name == author_data.name.strip()).first()
-                if not author:
-                    author = Author(name=author_data.name.strip())
-                    db.add(author)
-                    db.commit()
-                    db.refresh(author)
-                db.add(PaperAuthors(paper_id=paper.paper_id, author_id=author.author_id))
-        except Exception as author_error:
-            print(f"Error with authors: {str(author_error)}")
-        
-        # Add tags and PaperTags
-        try:
-            for kw in payload.keywords:
-                if not kw or not kw.strip():
-                    continue  # Skip empty keywords
-                    
-                kw_clean = kw.strip().lower()
-                tag = db.query(Tags).filter(Tags.name == kw_clean).first()
-                if not tag:
-                    tag = Tags(name=kw_clean)
-                    db.add(tag)
-                    db.commit()
-                    db.refresh(tag)
-                db.add(PaperTags(paper_id=paper.paper_id, tag_id=tag.tag_id))
-        except Exception as tag_error:
-            print(f"Error with tags: {str(tag_error)}")
-
-        # Add collections and PaperCollections
-        try:
-            for cname in payload.collections:
-                if not cname or not cname.strip():
-                    continue  # Skip empty names
-                    
-                name_clean = cname.strip()
-                collection = db.query(Collection).filter(Collection.name == name_clean).first()
-                if not collection:
-                    collection = Collection(name=name_clean)
-                    db.add(collection)
-                    db.commit()
-                    db.refresh(collection)
-                db.add(PaperCollections(paper_id=paper.paper_id, collection_id=collection.id))
-        except Exception as col_error:
-            print(f"Error with collections: {str(col_error)}")
-        
-        db.commit()
-        
-        return {"paper_id": paper.paper_id,
-                "pdf_path" : paper.pdf_path}
-    
     except HTTPException as e:
         db.rollback()
         print(f"HTTP Exception: {e.detail}")
@@ -251,6 +272,15 @@ async def add_paper(payload: PaperInput, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error adding paper: {str(e)}")
 
+    # The paper is saved either way; one whose vector fails here is picked up
+    # by the backfill on the next startup
+    try:
+        await encode_pool.run(paper_vectors.upsert,
+                              [(response["paper_id"], paper_text(payload.title, payload.abstract))])
+    except Exception as e:
+        print(f"Error indexing paper {response['paper_id']} for similarity search: {e}")
+    return response
+
 def to_paper_output(paper: Paper) -> PaperOutput:
     return PaperOutput(
         paper_id = paper.paper_id,
@@ -266,10 +296,241 @@ def to_paper_output(paper: Paper) -> PaperOutput:
         collections=[collection.name for collection in paper.collections]
     )
 
-@app.get("/papers", response_model=List[PaperOutput])
-def get_papers(db: Session = Depends(get_db)):
-    db_papers = db.query(Paper).all()
-    return [to_paper_output(paper) for paper in db_papers]
+# Listings load each relationship for the whole page in one batched IN query,
+# so a page costs a constant number of queries instead of 1 + 3 per paper.
+PAPER_LISTING_LOADS = (
+    selectinload(Paper.authors),
+    selectinload(Paper.tags),
+    selectinload(Paper.collections),
+)
+
+def to_paper_listing_item(paper: Paper) -> Dict[str, Any]:
+    """Project a paper with preloaded relationships straight into the JSON shape of PaperOutput."""
+    return {
+        "paper_id": paper.paper_id,
+        "title": paper.title,
+        "authors": [{"name": author.name} for author in paper.authors],
+        "abstract": paper.abstract,
+        "status": paper.current_status,
+        "keywords": [tag.name for tag in paper.tags],
+        "isFavourite": bool(paper.isFavourite),
+        "addedDate": paper.added_on.isoformat() if paper.added_on else None,
+        "publication_date": paper.publication_date.isoformat() if paper.publication_date else None,
+        "pdf_path": paper.pdf_path,
+        "collections": [collection.name for collection in paper.collections]
+    }
+
+PAPERS_PAGE_SIZE = 50
+PAPERS_MAX_PAGE_SIZE = 200
+
+# sort name -> (sort column, newest/largest first)
+PAPER_SORTS = {
+    "date_added": (Paper.added_on, True),
+    "publication_date": (Paper.publication_date, True),
+    "title": (Paper.title, False),
+}
+
+def encode_cursor(value, paper_id: int) -> str:
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    raw = json.dumps([value, paper_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str, sort: str):
+    try:
+        value, paper_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if value is not None and sort == "date_added":
+            value = datetime.fromisoformat(value)
+        elif value is not None and sort == "publication_date":
+            value = date.fromisoformat(value)
+        return value, int(paper_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paper_sort_order(sort: str):
+    column, descending = PAPER_SORTS[sort]
+    if descending:
+        # Papers without a value go last, whatever the database's NULL ordering is
+        return [column.is_(None), column.desc(), Paper.paper_id.desc()]
+    return [column.is_(None), column.asc(), Paper.paper_id.asc()]
+
+def paper_keyset_after(sort: str, value, paper_id: int):
+    """Condition selecting the papers that sort strictly after (value, paper_id)."""
+    column, descending = PAPER_SORTS[sort]
+    if value is None:
+        tie_break = Paper.paper_id < paper_id if descending else Paper.paper_id > paper_id
+        return and_(column.is_(None), tie_break)
+    if descending:
+        return or_(column < value, and_(column == value, Paper.paper_id < paper_id), column.is_(None))
+    return or_(column > value, and_(column == value, Paper.paper_id > paper_id), column.is_(None))
+
+def paper_listing_filters(status: Optional[str], favourite: Optional[bool],
+                          collection: Optional[str], tag: Optional[str]) -> list:
+    filters = []
+    if status:
+        filters.append(Paper.current_status == status)
+    if favourite is not None:
+        filters.append(Paper.isFavourite == favourite)
+    if collection:
+        filters.append(Paper.collections.any(Collection.name == collection.strip()))
+    if tag:
+        filters.append(Paper.tags.any(Tags.name == tag.strip().lower()))
+    return filters
+
+@app.get("/papers", response_model=PaperPage)
+def get_papers(
+    limit: int = Query(PAPERS_PAGE_SIZE, ge=1, le=PAPERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "date_added",
+    status: Optional[str] = None,
+    favourite: Optional[bool] = None,
+    collection: Optional[str] = None,
+    tag: Optional[str] = None,
+    q: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    if sort not in PAPER_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(PAPER_SORTS)}")
+
+    query = db.query(Paper).filter(*paper_listing_filters(status, favourite, collection, tag))
+    if q and q.strip():
+        query = query.filter(*search_filters(parse_search_query(q), uses_fulltext(db)))
+
+    total = query.order_by(None).count()
+
+    if cursor:
+        query = query.filter(paper_keyset_after(sort, *decode_cursor(cursor, sort)))
+    db_papers = (
+        query.options(*PAPER_LISTING_LOADS)
+        .order_by(*paper_sort_order(sort))
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(db_papers) > limit:
+        db_papers = db_papers[:limit]
+        last = db_papers[-1]
+        next_cursor = encode_cursor(getattr(last, PAPER_SORTS[sort][0].key), last.paper_id)
+
+    # Returned as a ready-made response: the items are already in PaperPage's shape,
+    # and validating every row through pydantic costs more than the queries do.
+    return JSONResponse(content={
+        "items": [to_paper_listing_item(paper) for paper in db_papers],
+        "total": total,
+        "next_cursor": next_cursor
+    })
+
+@app.get("/papers/search", response_model=PaperPage)
+def search_paper_listing(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(PAPERS_PAGE_SIZE, ge=1, le=PAPERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    favourite: Optional[bool] = None,
+    collection: Optional[str] = None,
+    tag: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Papers matching q, best match first (see utils/paper_search.py for the
+    query syntax). Items carry their relevance score; the cursor is an offset
+    into the ranking.
+    """
+    query = parse_search_query(q)
+    if not query:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    total, ranked = rank_papers(db, query, paper_listing_filters(status, favourite, collection, tag), limit, offset)
+    next_offset = offset + len(ranked)
+    return JSONResponse(content={
+        "items": scored_listing_items(db, ranked),
+        "total": total,
+        "next_cursor": str(next_offset) if next_offset < total else None
+    })
+
+def scored_listing_items(db: Session, ranked: List[Tuple[int, Optional[float]]]) -> List[Dict[str, Any]]:
+    """Listing items of (paper_id, score) pairs, in their given order and carrying their score."""
+    papers = {
+        paper.paper_id: paper
+        for paper in db.query(Paper).options(*PAPER_LISTING_LOADS)
+        .filter(Paper.paper_id.in_([paper_id for paper_id, _ in ranked]))
+    }
+    items = []
+    for paper_id, score in ranked:
+        if paper_id not in papers:
+            continue  # deleted since it was ranked
+        item = to_paper_listing_item(papers[paper_id])
+        item["score"] = score
+        items.append(item)
+    return items
+
+def listing_candidates(db: Session, filters: list) -> Optional[Set[int]]:
+    """Ids of the papers passing the listing filters, or None when there are none (the whole library)."""
+    if not filters:
+        return None
+    return {paper_id for paper_id, in db.query(Paper.paper_id).filter(*filters)}
+
+SIMILAR_PAPERS_LIMIT = 10
+SIMILAR_PAPERS_MAX_LIMIT = 100
+
+@app.get("/papers/semantic", response_model=PaperPage)
+async def semantic_paper_search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(SIMILAR_PAPERS_LIMIT, ge=1, le=SIMILAR_PAPERS_MAX_LIMIT),
+    status: Optional[str] = None,
+    favourite: Optional[bool] = None,
+    collection: Optional[str] = None,
+    tag: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Papers whose title and abstract are closest in meaning to q, closest first."""
+    query = normalize_query(q)
+    if not query:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    # Database work and the index search block, so they run off the event loop
+    candidates = await run_in_threadpool(
+        listing_candidates, db, paper_listing_filters(status, favourite, collection, tag))
+    query_vector = await embed_query(query)
+    ranked = await run_in_threadpool(paper_vectors.search, query_vector, limit, candidates)
+    items = await run_in_threadpool(scored_listing_items, db, ranked)
+    return JSONResponse(content={"items": items, "total": len(items), "next_cursor": None})
+
+@app.get("/papers/{paper_id}/similar", response_model=PaperPage)
+async def similar_papers(
+    paper_id: int,
+    limit: int = Query(SIMILAR_PAPERS_LIMIT, ge=1, le=SIMILAR_PAPERS_MAX_LIMIT),
+    status: Optional[str] = None,
+    favourite: Optional[bool] = None,
+    collection: Optional[str] = None,
+    tag: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """The papers most like a paper by title and abstract, most similar first."""
+    paper = await run_in_threadpool(
+        lambda: db.query(Paper.title, Paper.abstract).filter(Paper.paper_id == paper_id).first())
+    if paper is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    if paper_id not in paper_vectors:
+        # Not embedded yet (the startup backfill has not reached it); do it now
+        try:
+            await encode_pool.run(paper_vectors.upsert, [(paper_id, paper_text(paper.title, paper.abstract))])
+        except PoolBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    candidates = await run_in_threadpool(
+        listing_candidates, db, paper_listing_filters(status, favourite, collection, tag))
+    ranked = await run_in_threadpool(paper_vectors.similar, paper_id, limit, candidates)
+    if ranked is None:
+        raise HTTPException(status_code=404, detail="Paper has no title or abstract to compare")
+    items = await run_in_threadpool(scored_listing_items, db, ranked)
+    return JSONResponse(content={"items": items, "total": len(items), "next_cursor": None})
 
 @app.get("/paper_/{paper_id}", response_model=PaperOutput)
 def get_paper(paper_id: int, db: Session = Depends(get_db)):
@@ -328,6 +589,11 @@ def delete_paper(paper_id: int, db: Session = Depends(get_db)):
 
     db.delete(paper)
     db.commit()
+
+    # Tombstone the paper's chunks; compaction reclaims them in the background
+    vector_store.delete_paper(paper_id)
+    vector_store.maintain()
+    paper_vectors.remove(paper_id)
     return {"message": f"Paper {paper_id} deleted successfully"}
 
 @app.get("/get-collections/", response_model=List[CollectionOutput])
@@ -379,11 +645,13 @@ def update_paper_collections(update_data: PaperCollectionUpdate, db: Session = D
 
 @app.post("/add-collection/", response_model=CollectionOutput)
 def add_collection(collection: CollectionOutput, db: Session = Depends(get_db)):
-    new_collection = Collection(**collection.dict())
-    db.add(new_collection)
+    # Names are unique; adding an existing collection just returns it
+    name = collection.name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Collection name is required")
+    collection_id = resolve_name_ids(db, Collection, [name])[name]
     db.commit()
-    db.refresh(new_collection)
-    return new_collection
+    return db.get(Collection, collection_id)
 
 
 @app.delete("/delete-collection/{collection_name}/")
@@ -395,44 +663,8 @@ def delete_collection(collection_name: str, db: Session = Depends(get_db)):
     db.commit()
     return {"message": f"Collection '{collection_name}' deleted successfully"}
 
-def clean_text(text: str) -> str:
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'\n\d+\n', ' ', text)
-    return text.strip()
-
-def chunk_text_paragraphwise(text: str, chunk_size=4000, overlap_sentences=6) -> List[str]:
-    # Split into sentences by punctuation + whitespace
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    for i, sentence in enumerate(sentences):
-        sentence_len = len(sentence)
-        
-        if current_length + sentence_len > chunk_size and current_chunk:
-            # Join current chunk sentences
-            chunk_text = " ".join(current_chunk).strip()
-            chunks.append(chunk_text)
-            
-            # Overlap: keep last N sentences for next chunk
-            overlap = current_chunk[-overlap_sentences:] if overlap_sentences < len(current_chunk) else current_chunk
-            current_chunk = overlap.copy()
-            current_length = sum(len(s) for s in current_chunk) + len(current_chunk) - 1  # add space count
-        else:
-            current_chunk.append(sentence)
-            current_length += sentence_len + 1  # +1 for space
-
-    # Add last chunk if any sentences remain
-    if current_chunk:
-        chunk_text = " ".join(current_chunk).strip()
-        chunks.append(chunk_text)
-    
-    return chunks
-
 def embed_text(texts: List[str]) -> np.ndarray:
-    embeddings = model.encode(
+    embeddings = embedding_model.get().encode(
         texts, 
         convert_to_numpy=True, 
         show_progress_bar=False,
@@ -441,44 +673,18 @@ def embed_text(texts: List[str]) -> np.ndarray:
     )
     return embeddings.astype('float32')
 
-def extract_chunks_from_pdf(pdf_path: str) -> List[str]:
-    doc = fitz.open(pdf_path)
-    full_text = ""
-    
-    for page in doc:
-        page_text = page.get_text()
-        if len(page_text.strip()) > 50:  # Skip mostly empty pages
-            full_text += clean_text(page_text) + " "
-    
-    doc.close()
-    
-    chunks = chunk_text_paragraphwise(full_text, chunk_size=2000)
-    return [chunk for chunk in chunks if len(chunk.strip()) > 100]
+# Embeds with the same model as the chunks, one vector per paper
+paper_vectors = PaperVectors(paper_vector_store, embed_text)
 
-def paper_exists(paper_id: str) -> bool:
-    for metadata in metadata_store.values():
-        if metadata.get("paper_id") == paper_id:
-            return True
-    return False
+def paper_exists(paper_id: int) -> bool:
+    return vector_store.has_paper(paper_id)
 
-def save_index_and_metadata():
+def migrate_legacy_index_and_metadata():
     try:
-        faiss.write_index(index, FAISS_INDEX_PATH)
-        
-        with open(METADATA_PATH, 'wb') as f:
-            pickle.dump(dict(metadata_store), f)
-        
-        with open(VECTOR_ID_PATH, 'w') as f:
-            f.write(str(current_vector_id))
-            
-        print("Index and metadata saved successfully")
-    except Exception as e:
-        print(f"Error saving index and metadata: {e}")
+        index = faiss.IndexFlatIP(dimension)
+        metadata_store = {}
+        current_vector_id = 0
 
-def load_index_and_metadata():
-    global index, metadata_store, current_vector_id
-    
-    try:
         # Load FAISS index
         if os.path.exists(FAISS_INDEX_PATH):
             index = faiss.read_index(FAISS_INDEX_PATH)
@@ -500,123 +706,356 @@ def load_index_and_metadata():
                 current_vector_id = int(f.read().strip())
             print(f"Loaded current vector ID: {current_vector_id}")
         else:
-            current_vector_id = 0
             print("Starting with vector ID: 0")
+
+        vector_store.set_legacy_state(index, metadata_store, current_vector_id)
+        vector_store.compact()
             
+    except Exception as e:
+        # Without the compacted snapshot the store has no WAL; the caller must
+        # not mark it loaded and let ingests go unlogged
+        print(f"Error migrating index and metadata: {e}")
+        raise
+
+def load_index_and_metadata():
+    global vector_store_loaded
+    started = time.perf_counter()
+    try:
+        if not vector_store.load():
+            migrate_legacy_index_and_metadata()
+            vector_store.maintain()
+        vector_store_loaded = True
     except Exception as e:
         print(f"Error loading index and metadata: {e}")
+    startup_timings["vector_store_seconds"] = round(time.perf_counter() - started, 3)
+
+def load_paper_vectors():
+    try:
+        if not paper_vector_store.load():
+            # Start generation 1 so vectors added from now on are logged
+            paper_vector_store.compact()
+        # Papers added before this index existed (or whose vector failed) are embedded in the background
+        paper_vectors.backfill_in_background(SessionLocal)
+    except Exception as e:
+        print(f"Error loading paper vectors: {e}")
+
+def warmup_models():
+    """Load the models and run one encode so the first request does not pay for it."""
+    started = time.perf_counter()
+    try:
+        embed_text(["warmup"])
+        if CHATBOT_LLM != "stub":
+            context_crew.get()
+    except Exception as e:
+        print(f"Error warming up models: {e}")
+    startup_timings["warmup_seconds"] = round(time.perf_counter() - started, 3)
 
 @app.post("/upload_paper")
 async def upload_paper(data: UploadRequest):
-    global current_vector_id
-    
     # Check if paper already exists
     if paper_exists(data.paper_id):
         return {"status": "exists", "message": f"Paper with ID '{data.paper_id}' already exists"}
     
-    try:
-        chunks = extract_chunks_from_pdf(data.pdf_path)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
+    # Chunk the TEI body GROBID produced at /extract/ when it is still cached;
+    # otherwise (or if it has no body text) parse the PDF itself
+    chunks, chunk_source = [], "tei"
+    pdf_hash = await run_in_threadpool(find_pdf_hash_by_id, data.paper_id)
+    tei_path = tei_cache.tei_path(pdf_hash) if pdf_hash else None
+    if tei_path:
+        try:
+            chunks = await parse_pool.run(extract_chunks_from_tei, tei_path)
+        except PoolBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            print(f"TEI chunking failed for paper {data.paper_id}, parsing the PDF instead: {e}")
+
+    if not chunks:
+        chunk_source = "pdf"
+        try:
+            chunks = await parse_pool.run(extract_chunks_from_pdf, data.pdf_path)
+        except PoolBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
     
     if not chunks:
         raise HTTPException(status_code=400, detail="No valid text content found in PDF")
     
-    embeddings = embed_text(chunks)
-    
-    for i, chunk in enumerate(chunks):
-        vector = embeddings[i].reshape(1, -1)
-        index.add(vector)
-        
-        metadata_store[current_vector_id] = {
-            "paper_id": data.paper_id,
-            "text": chunk
-        }
-        current_vector_id += 1
-    
-    # Save to disk after adding new data
-    save_index_and_metadata()
+    texts = [chunk["text"] for chunk in chunks]
+    try:
+        embeddings = await encode_pool.run(embed_text, texts)
+    except PoolBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    # Appends the new vectors and chunks to the WAL (fsync) before applying them in memory
+    await run_in_threadpool(vector_store.add_paper, data.paper_id, texts, embeddings,
+                            provenance_array(chunks))
+    await run_in_threadpool(vector_store.maintain)
     
-    return {"status": "success", "chunks_added": len(chunks)}
+    return {"status": "success", "chunks_added": len(chunks), "chunk_source": chunk_source}
+
+bulk_importer = BulkImporter(
+    SessionLocal, vector_store, GROBID_URL, UPLOAD_DIR,
+    parse_tei=parse_tei,
+    extract_chunks=extract_chunks_from_pdf,
+    embed=embed_text,
+    extract_keyword=extract_keyword,
+    tei_cache=tei_cache,
+    extract_tei_chunks=extract_chunks_from_tei,
+    paper_vectors=paper_vectors
+)
+
+@app.post("/bulk-import")
+def bulk_import(request: BulkImportRequest):
+    """Import every PDF in a folder or zip archive on the server's filesystem."""
+    if not os.path.exists(request.path):
+        raise HTTPException(status_code=404, detail=f"'{request.path}' not found")
+    try:
+        return bulk_importer.run(request.path, request.extract_keywords, request.collections)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/bulk-import/zip")
+def bulk_import_zip(file: UploadFile = File(...), extract_keywords: bool = True,
+                    collections: List[str] = Query([])):
+    archive_path = os.path.join(UPLOAD_DIR, f"bulk-{os.getpid()}-{id(file)}.zip")
+    with open(archive_path, "wb") as out:
+        shutil.copyfileobj(file.file, out)
+    try:
+        return bulk_importer.run(archive_path, extract_keywords, collections)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        os.remove(archive_path)
 
 @app.on_event("startup")
 async def startup_event():
     load_index_and_metadata()
+    load_paper_vectors()
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warmup_models, name="warmup", daemon=True).start()
+
+@app.get("/ready")
+async def get_ready():
+    """200 once search can be served without loading anything, 503 until then."""
+    components = {
+        "vector_store": {"state": "ready" if vector_store_loaded else "not_loaded"},
+        "embedding_model": embedding_model.status(),
+        "chat_llm": context_crew.status(),
+    }
+    ready = vector_store_loaded and embedding_model.ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "components": components, "startup": startup_timings}
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await grobid_client.aclose()
+    parse_pool.shutdown()
+    encode_pool.shutdown()
+    await query_embedder.aclose()
+
+@app.get("/ingest_stats")
+async def get_ingest_stats():
+    return {"parse": parse_pool.stats(), "encode": encode_pool.stats()}
+
+@app.get("/grobid_stats")
+async def get_grobid_stats():
+    return {**grobid_client.stats(), "tei_cache": tei_cache.stats()}
+
+@app.get("/embedding_stats")
+async def get_embedding_stats():
+    return query_embedder.stats()
 
 @app.get("/storage_stats")
 async def get_storage_stats():
+    # A fixed-size summary; per-paper numbers are at /storage_stats/{paper_id}
     return {
-        "total_vectors": index.ntotal,
-        "metadata_entries": len(metadata_store),
-        "current_vector_id": current_vector_id,
+        "total_vectors": vector_store.ntotal,
+        "dead_vectors": len(vector_store.tombstones),
+        "metadata_entries": len(vector_store.chunks),
+        "current_vector_id": vector_store.next_vector_id,
+        "papers_indexed": len(vector_store.papers),
+        "index_mode": VECTOR_INDEX_MODE,
+        "index_kind": index_kind(vector_store.index)[0],
+        "generation": vector_store.generation,
+        "wal_bytes": vector_store.wal.size() if vector_store.wal else 0,
         "files_exist": {
-            "faiss_index": os.path.exists(FAISS_INDEX_PATH),
-            "metadata": os.path.exists(METADATA_PATH),
-            "vector_id": os.path.exists(VECTOR_ID_PATH)
+            "manifest": os.path.exists(os.path.join(VECTOR_STORE_DIR, "MANIFEST")),
+            "legacy_faiss_index": os.path.exists(FAISS_INDEX_PATH),
+            "legacy_metadata": os.path.exists(METADATA_PATH)
+        },
+        "index_version": vector_store.version,
+        "paper_vectors": {
+            "papers": paper_vector_store.ntotal,
+            "index_kind": index_kind(paper_vector_store.index)[0],
+            "generation": paper_vector_store.generation,
+            "wal_bytes": paper_vector_store.wal.size() if paper_vector_store.wal else 0
+        },
+        "caches": {
+            "query_embeddings": query_embedding_cache.stats(),
+            "retrieval": retrieval_cache.stats(),
+            "answers": answer_cache.stats()
         }
     }
 
-def search_similar_chunks(query: str, paper_id: str = None, top_k: int = 5) -> List[Dict[str, Any]]:
-    if index.ntotal == 0:
+@app.get("/storage_stats/{paper_id}")
+async def get_paper_storage_stats(paper_id: int):
+    stats = vector_store.paper_stats(paper_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Paper not indexed")
+    return stats
+
+def resolve_paper_filter(
+    db: Session,
+    paper_ids: Optional[List[int]] = None,
+    collection: Optional[str] = None,
+    tag: Optional[str] = None
+) -> Optional[Set[int]]:
+    """
+    Turn the chat filters into the set of paper ids whose chunks may be retrieved.
+    Returns None when no filter is given, i.e. the whole library is searched.
+    """
+    if not paper_ids and not collection and not tag:
+        return None
+
+    selected = set(paper_ids) if paper_ids else None
+
+    def narrow(ids):
+        return ids if selected is None else selected & ids
+
+    if collection:
+        rows = (
+            db.query(PaperCollections.paper_id)
+            .join(Collection, Collection.id == PaperCollections.collection_id)
+            .filter(Collection.name == collection.strip())
+            .all()
+        )
+        selected = narrow({row.paper_id for row in rows})
+
+    if tag:
+        rows = (
+            db.query(PaperTags.paper_id)
+            .join(Tags, Tags.tag_id == PaperTags.tag_id)
+            .filter(Tags.name == tag.strip().lower())
+            .all()
+        )
+        selected = narrow({row.paper_id for row in rows})
+
+    return selected
+
+# Concurrent chat queries are encoded together in small batches
+query_embedder = QueryEmbeddingBatcher(embed_text)
+
+# normalized query -> embedding; the model never changes, so only size and age bound it
+query_embedding_cache = LRUCache(
+    int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096)),
+    float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 24 * 3600))
+)
+# (normalized query, paper filter, top_k, index version) -> (scores, vector ids)
+retrieval_cache = LRUCache(
+    int(os.getenv("RETRIEVAL_CACHE_SIZE", 4096)),
+    float(os.getenv("RETRIEVAL_CACHE_TTL", 600))
+)
+retrieval_cache_version = vector_store.version
+
+async def embed_query(query: str) -> np.ndarray:
+    """Embedding of a normalized query, batched with concurrent queries and cached."""
+    query_vector = query_embedding_cache.get(query)
+    if query_vector is None:
+        query_vector = await query_embedder.embed(query)
+        query_embedding_cache.put(query, query_vector)
+    return query_vector
+
+async def search_similar_chunks(query: str, paper_ids: Optional[Set[int]] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+    global retrieval_cache_version
+    if vector_store.ntotal == 0:
         return []
-    
-    query_embedding = model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
-    query_vector = query_embedding.astype('float32')
-    
-    if paper_id:
-        # When filtering by paper_id, we need to search through all chunks to find matches
-        # Start with a reasonable number and increase if needed
-        search_k = index.ntotal
-        distances, indices = index.search(query_vector, search_k)
-        
-        results = []
-        for distance, idx in zip(distances[0], indices[0]):
-            if idx == -1:
-                continue
-                
-            metadata = metadata_store.get(idx, {})
-            
-            if metadata.get("paper_id") == paper_id:
-                results.append({
-                    "text": metadata.get("text", ""),
-                    "paper_id": metadata.get("paper_id", ""),
-                    "similarity_score": float(distance)
-                })
-                
-                if len(results) >= top_k:
-                    break
-        
-        results.sort(key=lambda x: x["similarity_score"], reverse=True)
-        return results[:top_k]
-    
-    else:
-        distances, indices = index.search(query_vector, top_k)
-        
-        results = []
-        for distance, idx in zip(distances[0], indices[0]):
-            if idx == -1:
-                continue
-                
-            metadata = metadata_store.get(idx, {})
-            results.append({
-                "text": metadata.get("text", ""),
-                "paper_id": metadata.get("paper_id", ""),
-                "similarity_score": float(distance)
-            })
 
-        results.sort(key=lambda x: x["similarity_score"], reverse=True)
-        return results[:top_k]
+    # Entries of an older index version can never be hit again; drop them
+    version = vector_store.version
+    if version != retrieval_cache_version:
+        retrieval_cache.clear()
+        retrieval_cache_version = version
+
+    query = normalize_query(query)
+    key = (query, frozenset(paper_ids) if paper_ids is not None else None, top_k, version)
+    hits = retrieval_cache.get(key)
+    if hits is None:
+        query_vector = await embed_query(query)
+        hits = await run_in_threadpool(vector_store.search_ids, query_vector, top_k, paper_ids=paper_ids)
+        retrieval_cache.put(key, hits)
+
+    return await run_in_threadpool(vector_store.results_for, *hits)
 
 @app.post("/chatbot")
-async def search_papers(query: str, paper_id: Optional[str] = None, top_k: int = 2):
+async def search_papers(
+    query: str,
+    paper_id: Optional[int] = None,
+    top_k: int = 2,
+    paper_ids: Optional[List[int]] = Query(None),
+    collection: Optional[str] = None,
+    tag: Optional[str] = None,
+    use_cache: bool = True,
+    db: Session = Depends(get_db)
+):
     try:
         # Step 1: Retrieve top sections
-        results = search_similar_chunks(query, paper_id, top_k)
+        if paper_id is not None:
+            paper_ids = (paper_ids or []) + [paper_id]
+        paper_filter = await run_in_threadpool(resolve_paper_filter, db, paper_ids, collection, tag)
+        results = await search_similar_chunks(query, paper_filter, top_k)
 
-        # Step 2: Answer the query using top sections
-        answer = answer_user_query(query=query, top_sections=results)
+        # Step 2: Answer the query using top sections (a blocking LLM call)
+        answer = await run_in_threadpool(answer_user_query, query=query, top_sections=results,
+                                         use_cache=use_cache)
 
         return answer
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chatbot/stream")
+async def stream_chatbot(
+    query: str,
+    paper_id: Optional[int] = None,
+    top_k: int = 2,
+    paper_ids: Optional[List[int]] = Query(None),
+    collection: Optional[str] = None,
+    tag: Optional[str] = None,
+    use_cache: bool = True,
+    db: Session = Depends(get_db)
+):
+    """
+    Server-Sent Events version of /chatbot: a `sources` event with the retrieved
+    chunks as soon as retrieval is done, one `token` event per generated piece of
+    the answer, then `done` (or `error`).
+    """
+    if paper_id is not None:
+        paper_ids = (paper_ids or []) + [paper_id]
+    paper_filter = await run_in_threadpool(resolve_paper_filter, db, paper_ids, collection, tag)
+
+    async def events():
+        started = time.perf_counter()
+        try:
+            results = await search_similar_chunks(query, paper_filter, top_k)
+            yield sse_event("sources", results)
+
+            first_token = None
+            async for token in iterate_in_threadpool(stream_answer(query, results, use_cache)):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                yield sse_event("token", token)
+
+            yield sse_event("done", {
+                "first_token_ms": round(first_token * 1000, 1) if first_token is not None else None,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1)
+            })
+        except Exception as e:
+            yield sse_event("error", {"detail": str(getattr(e, "detail", e))})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,7 +1,7 @@
 from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Date, Boolean
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index
 import hashlib
 from datetime import datetime
 
@@ -9,6 +9,11 @@ Base = declarative_base()
 
 class Paper(Base):
     __tablename__ = 'papers'
+    # Inverted indexes for /papers/search (MySQL only, see utils/paper_search.py)
+    __table_args__ = (
+        Index("ft_papers_title", "title", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        Index("ft_papers_title_abstract", "title", "abstract", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     paper_id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String(1000), nullable=False)
@@ -31,6 +36,10 @@ class Paper(Base):
 
 class Author(Base):
     __tablename__ = "authors"
+    __table_args__ = (
+        Index("uq_authors_name", "name", unique=True),
+        Index("ft_authors_name", "name", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     author_id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)  # Length constraint for name
@@ -40,6 +49,8 @@ class Author(Base):
 
 class PaperAuthors(Base):
     __tablename__ = "paper_authors"
+    # The primary key covers paper -> authors; this covers author -> papers
+    __table_args__ = (Index("ix_paper_authors_author_id", "author_id"),)
 
     paper_id = Column(Integer, ForeignKey('papers.paper_id'), primary_key=True)
     author_id = Column(Integer, ForeignKey('authors.author_id'), primary_key=True)
@@ -47,6 +58,10 @@ class PaperAuthors(Base):
 
 class Tags(Base):
     __tablename__ = "tags"
+    __table_args__ = (
+        Index("uq_tags_name", "name", unique=True),
+        Index("ft_tags_name", "name", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     tag_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(500))
@@ -55,12 +70,14 @@ class Tags(Base):
 
 class PaperTags(Base):
     __tablename__ = "paper_tags"
+    __table_args__ = (Index("ix_paper_tags_tag_id", "tag_id"),)
 
     paper_id = Column(Integer, ForeignKey('papers.paper_id'), primary_key=True)
     tag_id = Column(Integer, ForeignKey('tags.tag_id'), primary_key=True)
 
 class Collection(Base):
     __tablename__ = "collections"
+    __table_args__ = (Index("uq_collections_name", "name", unique=True),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(255), nullable=False)
@@ -70,6 +87,7 @@ class Collection(Base):
 
 class PaperCollections(Base):
     __tablename__ = "paper_collections"
+    __table_args__ = (Index("ix_paper_collections_collection_id", "collection_id"),)
 
     paper_id = Column(Integer, ForeignKey("papers.paper_id"), primary_key=True)
     collection_id = Column(Integer, ForeignKey("collections.id"), primary_key=True)
@@ -38,6 +38,12 @@ class PaperOutput(BaseModel):
         from_attributes = True
 
 
+class PaperPage(BaseModel):
+    items: List[PaperOutput]
+    total: int
+    next_cursor: Optional[str] = None
+
+
 class UpdateFavouriteStatus(BaseModel):
     paper_id: int
     isFavourite: bool  
@@ -58,5 +64,10 @@ class PaperCollectionUpdate(BaseModel):
     collections: Dict[str, int]
 
 class UploadRequest(BaseModel):
-    paper_id: str
-    pdf_path: str
\ No newline at end of file
+    paper_id: int
+    pdf_path: str
+
+class BulkImportRequest(BaseModel):
+    path: str
+    extract_keywords: bool = True
+    collections: List[str] = []
@@ -0,0 +1,448 @@
+"""
+Bulk import of a folder or zip archive of PDFs.
+
+The pipeline hashes every PDF and drops the ones whose pdf_hash is already in
+the library, copies the rest into the upload directory, then runs GROBID
+metadata extraction on a thread pool. Papers are chunked along the sections of
+GROBID's TEI body; only when that body is empty is the PDF itself parsed for
+text, on a second pool. Chunks are encoded in large batches across papers
+as soon as they are ready. Paper, author, tag and collection rows are then
+committed in batches of INSERT_BATCH_PAPERS papers. A batch that fails is
+retried one paper at a time, so a bad row only costs its own paper: that paper
+is reported as failed and its copied PDF removed. Finally the vectors of the
+saved papers are appended to the vector store. The report carries per-stage
+item counts and throughput.
+
+From the project root, with the API server stopped (it owns the vector store):
+
+    python -m backend.app.utils.bulk_import ~/papers
+    python -m backend.app.utils.bulk_import library.zip --no-keywords --collection "Reading group"
+"""
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date
+import argparse
+import hashlib
+import os
+import shutil
+import time
+import zipfile
+import numpy as np
+import requests
+from sqlalchemy import insert
+
+from ..models import Paper, Author, Tags, Collection, PaperAuthors, PaperTags, PaperCollections
+from .name_lookup import resolve_name_ids
+from .chunk_store import provenance_array
+from .grobid_client import GROBID_FULLTEXT_OPTIONS
+from .paper_vectors import paper_text
+
+GROBID_WORKERS = int(os.getenv("BULK_IMPORT_GROBID_WORKERS", 4))
+PARSE_WORKERS = int(os.getenv("BULK_IMPORT_PARSE_WORKERS", 4))
+# Chunks per model.encode call; batching across papers keeps the model busy
+ENCODE_BATCH_CHUNKS = int(os.getenv("BULK_IMPORT_ENCODE_BATCH", 512))
+
+HASH_BLOCK_BYTES = 1024 * 1024
+IN_CLAUSE_BATCH = 1000
+# Papers inserted per transaction; a failing batch is retried one paper at a
+# time so a single bad row only loses that paper
+INSERT_BATCH_PAPERS = int(os.getenv("BULK_IMPORT_INSERT_BATCH", 100))
+
+
+class StageTimer:
+    """Item counts, wall-clock span and busy time of each pipeline stage. Stages may overlap."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def record(self, stage: str, start: float, end: float, items: int = 1):
+        entry = self.stages.setdefault(stage, {"items": 0, "busy": 0.0, "first": start, "last": end})
+        entry["items"] += items
+        entry["busy"] += end - start
+        entry["first"] = min(entry["first"], start)
+        entry["last"] = max(entry["last"], end)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for stage, entry in self.stages.items():
+            seconds = entry["last"] - entry["first"]
+            report[stage] = {
+                "items": entry["items"],
+                "seconds": round(seconds, 3),
+                "busy_seconds": round(entry["busy"], 3),
+                "per_second": round(entry["items"] / seconds, 2) if seconds > 0 else None
+            }
+        return report
+
+
+def list_pdf_sources(source: str) -> List[Tuple[str, Callable]]:
+    """(file name, opener) for every PDF in a folder (recursively) or a zip archive."""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        return [(os.path.basename(path), lambda path=path: open(path, "rb")) for path in sorted(paths)]
+
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        members = [info for info in archive.infolist()
+                   if not info.is_dir() and info.filename.lower().endswith(".pdf")
+                   and not info.filename.startswith("__MACOSX/")]
+        return [(os.path.basename(info.filename), lambda info=info: archive.open(info)) for info in members]
+
+    raise ValueError(f"'{source}' is neither a folder nor a zip archive")
+
+
+def hash_file(opener: Callable) -> str:
+    digest = hashlib.sha256()
+    with opener() as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_publication_date(value: Optional[str]) -> Optional[date]:
+    # GROBID gives "YYYY", "YYYY-MM" or "YYYY-MM-DD"
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    try:
+        year = int(parts[0])
+        month = int(parts[1]) if len(parts) > 1 else 1
+        day = int(parts[2]) if len(parts) > 2 else 1
+        return date(year, month, day)
+    except (ValueError, IndexError):
+        return None
+
+
+class BulkImporter:
+    def __init__(
+        self,
+        session_factory,
+        vector_store,
+        grobid_url: str,
+        upload_dir: str,
+        parse_tei: Callable,
+        extract_chunks: Callable[[str], List[Dict[str, Any]]],
+        embed: Callable[[List[str]], np.ndarray],
+        extract_keyword: Optional[Callable] = None,
+        tei_cache=None,
+        extract_tei_chunks: Optional[Callable[[bytes], List[Dict[str, Any]]]] = None,
+        paper_vectors=None
+    ):
+        self.session_factory = session_factory
+        self.vector_store = vector_store
+        self.grobid_url = grobid_url
+        self.upload_dir = upload_dir
+        self.parse_tei = parse_tei
+        self.extract_chunks = extract_chunks
+        self.embed = embed
+        self.extract_keyword = extract_keyword
+        self.tei_cache = tei_cache
+        self.extract_tei_chunks = extract_tei_chunks
+        self.paper_vectors = paper_vectors
+
+    def run(self, source: str, extract_keywords: bool = True,
+            collections: Optional[List[str]] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        timer = StageTimer()
+        report: Dict[str, Any] = {"source": source, "imported": [], "duplicates": [], "failed": []}
+
+        items = self._hash_and_dedup(list_pdf_sources(source), timer, report)
+        report["found"] = len(items) + len(report["duplicates"])
+        items = self._store_files(items, timer, report)
+
+        self._extract(items, extract_keywords, timer, report)
+        items = [item for item in items if "error" not in item]
+
+        if items:
+            items = self._insert_rows(items, collections or [], timer, report)
+        if items:
+            self._index_vectors(items, timer)
+
+        report["imported"] = [
+            {"paper_id": item["paper_id"], "title": item["metadata"]["title"],
+             "pdf_path": item["pdf_path"], "chunks": len(item["chunks"])}
+            for item in items
+        ]
+        total = time.perf_counter() - started
+        report["stages"] = timer.report()
+        report["total_seconds"] = round(total, 3)
+        report["papers_per_second"] = round(len(items) / total, 2) if total > 0 else None
+        return report
+
+    def _hash_and_dedup(self, sources, timer: StageTimer, report) -> List[Dict[str, Any]]:
+        items = []
+        for name, opener in sources:
+            start = time.perf_counter()
+            items.append({"file": name, "open": opener, "pdf_hash": hash_file(opener)})
+            timer.record("hash", start, time.perf_counter())
+
+        start = time.perf_counter()
+        hashes = [item["pdf_hash"] for item in items]
+        existing = set()
+        db = self.session_factory()
+        try:
+            for offset in range(0, len(hashes), IN_CLAUSE_BATCH):
+                rows = db.query(Paper.pdf_hash).filter(Paper.pdf_hash.in_(hashes[offset:offset + IN_CLAUSE_BATCH]))
+                existing.update(row.pdf_hash for row in rows)
+        finally:
+            db.close()
+
+        new_items = []
+        for item in items:
+            if item["pdf_hash"] in existing:
+                report["duplicates"].append({"file": item["file"], "pdf_hash": item["pdf_hash"]})
+            else:
+                existing.add(item["pdf_hash"])  # the same PDF twice in one import
+                new_items.append(item)
+        timer.record("dedup", start, time.perf_counter(), len(items))
+        return new_items
+
+    def _store_files(self, items, timer: StageTimer, report) -> List[Dict[str, Any]]:
+        os.makedirs(self.upload_dir, exist_ok=True)
+        stored = []
+        for item in items:
+            start = time.perf_counter()
+            path = os.path.join(self.upload_dir, item["file"])
+            if os.path.exists(path):
+                path = os.path.join(self.upload_dir, f"{item['pdf_hash'][:8]}_{item['file']}")
+            try:
+                with item.pop("open")() as src, open(path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, HASH_BLOCK_BYTES)
+            except Exception as e:
+                report["failed"].append({"file": item["file"], "error": f"Could not store PDF: {e}"})
+                continue
+            item["pdf_path"] = path
+            stored.append(item)
+            timer.record("store", start, time.perf_counter())
+        return stored
+
+    def _grobid(self, item, extract_keywords: bool) -> Tuple[Tuple[Dict[str, Any], Optional[List]], float, float]:
+        """GROBID metadata plus, when extract_tei_chunks is set, the chunks of the TEI body (None if empty)."""
+        start = time.perf_counter()
+        tei = self.tei_cache.get_tei(item["pdf_hash"]) if self.tei_cache else None
+        if tei is None:
+            with open(item["pdf_path"], "rb") as f:
+                resp = requests.post(
+                    self.grobid_url,
+                    data=GROBID_FULLTEXT_OPTIONS,
+                    files={"input": (item["file"], f, "application/pdf")},
+                    timeout=120
+                )
+            if not resp.ok:
+                raise RuntimeError("Grobid error: " + resp.text[:200])
+            tei = resp.content
+            if self.tei_cache:
+                self.tei_cache.put_tei(item["pdf_hash"], tei)
+        metadata = self.parse_tei(tei)
+
+        if extract_keywords and self.extract_keyword and not metadata.get("keywords") and metadata.get("abstract"):
+            try:
+                metadata["keywords"] = self.extract_keyword(metadata["abstract"]) or []
+            except Exception as e:
+                print(f"Keyword extraction failed for {item['file']}:", e)
+
+        chunks = None
+        if self.extract_tei_chunks:
+            try:
+                chunks = self.extract_tei_chunks(tei) or None
+            except Exception as e:
+                print(f"TEI chunking failed for {item['file']}, parsing the PDF instead:", e)
+        return (metadata, chunks), start, time.perf_counter()
+
+    def _chunk(self, item) -> Tuple[List[Dict[str, Any]], float, float]:
+        start = time.perf_counter()
+        return self.extract_chunks(item["pdf_path"]), start, time.perf_counter()
+
+    def _extract(self, items, extract_keywords: bool, timer: StageTimer, report):
+        """Run GROBID and chunking concurrently, encoding chunks in cross-paper batches as they arrive."""
+        pending: List[Dict[str, Any]] = []
+
+        def encode_pending():
+            texts = [chunk["text"] for item in pending for chunk in item["chunks"]]
+            start = time.perf_counter()
+            embeddings = self.embed(texts) if texts else np.zeros((0, self.vector_store.dimension), dtype='float32')
+            timer.record("encode", start, time.perf_counter(), len(texts))
+            offset = 0
+            for item in pending:
+                item["embeddings"] = embeddings[offset:offset + len(item["chunks"])]
+                offset += len(item["chunks"])
+            pending.clear()
+
+        with ThreadPoolExecutor(GROBID_WORKERS) as grobid_pool, ThreadPoolExecutor(PARSE_WORKERS) as parse_pool:
+            futures = {}
+            for item in items:
+                futures[grobid_pool.submit(self._grobid, item, extract_keywords)] = (item, "grobid")
+                if not self.extract_tei_chunks:
+                    futures[parse_pool.submit(self._chunk, item)] = (item, "parse")
+
+            pending_chunks = 0
+            running = set(futures)
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item, stage = futures.pop(future)
+                    try:
+                        result, start, end = future.result()
+                    except Exception as e:
+                        if "error" not in item:
+                            item["error"] = f"{stage}: {e}"
+                        continue
+                    timer.record(stage, start, end)
+                    if stage == "grobid":
+                        item["metadata"], chunks = result
+                        if chunks is None:
+                            if self.extract_tei_chunks:
+                                # No usable TEI body: fall back to the PDF text
+                                parse_future = parse_pool.submit(self._chunk, item)
+                                futures[parse_future] = (item, "parse")
+                                running.add(parse_future)
+                            continue
+                    else:
+                        chunks = result
+                    item["chunks"] = chunks
+                    pending.append(item)
+                    pending_chunks += len(chunks)
+                    if pending_chunks >= ENCODE_BATCH_CHUNKS:
+                        encode_pending()
+                        pending_chunks = 0
+            encode_pending()
+
+        for item in items:
+            if "error" in item:
+                self._discard(item, report)
+
+    @staticmethod
+    def _discard(item, report):
+        """Report a paper as failed and remove its copied PDF."""
+        report["failed"].append({"file": item["file"], "error": item["error"]})
+        if os.path.exists(item["pdf_path"]):
+            os.remove(item["pdf_path"])
+
+    def _insert_rows(self, items, collections: List[str], timer: StageTimer, report) -> List[Dict[str, Any]]:
+        """Insert the papers in batches of INSERT_BATCH_PAPERS; returns the items that were saved."""
+        start = time.perf_counter()
+        inserted = []
+        for first in range(0, len(items), INSERT_BATCH_PAPERS):
+            batch = items[first:first + INSERT_BATCH_PAPERS]
+            try:
+                self._insert_batch(batch, collections)
+                inserted.extend(batch)
+                continue
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0]["error"] = f"database: {e}"
+                    self._discard(batch[0], report)
+                    continue
+            for item in batch:
+                try:
+                    self._insert_batch([item], collections)
+                    inserted.append(item)
+                except Exception as e:
+                    item["error"] = f"database: {e}"
+                    self._discard(item, report)
+        timer.record("database", start, time.perf_counter(), len(inserted))
+        return inserted
+
+    def _insert_batch(self, items, collections: List[str]):
+        """Insert papers and their author, tag and collection links in one transaction."""
+        db = self.session_factory()
+        try:
+            papers = []
+            for item in items:
+                metadata = item["metadata"]
+                paper = Paper(
+                    title=metadata.get("title") or os.path.splitext(item["file"])[0],
+                    abstract=metadata.get("abstract"),
+                    publication_date=parse_publication_date(metadata.get("publication_date")),
+                    pdf_path=item["pdf_path"],
+                    pdf_hash=item["pdf_hash"],
+                    current_status="Unread",
+                    isFavourite=False
+                )
+                item["author_names"] = list(dict.fromkeys(
+                    author["name"].strip() for author in metadata.get("authors", [])
+                    if author.get("name") and author["name"].strip()))
+                item["tag_names"] = list(dict.fromkeys(
+                    kw.strip().lower() for kw in metadata.get("keywords", []) if kw and kw.strip()))
+                item["paper_text"] = paper_text(paper.title, paper.abstract)
+                papers.append(paper)
+            db.add_all(papers)
+            db.flush()
+
+            authors = resolve_name_ids(db, Author, (n for item in items for n in item["author_names"]))
+            tags = resolve_name_ids(db, Tags, (n for item in items for n in item["tag_names"]))
+            collection_ids = set(resolve_name_ids(db, Collection, (c.strip() for c in collections)).values())
+
+            author_links, tag_links, collection_links = [], [], []
+            for item, paper in zip(items, papers):
+                item["paper_id"] = paper.paper_id
+                # Two spellings can resolve to one row under a case-insensitive collation
+                author_links.extend({"paper_id": paper.paper_id, "author_id": author_id}
+                                    for author_id in {authors[name] for name in item["author_names"]})
+                tag_links.extend({"paper_id": paper.paper_id, "tag_id": tag_id}
+                                 for tag_id in {tags[name] for name in item["tag_names"]})
+                collection_links.extend({"paper_id": paper.paper_id, "collection_id": collection_id}
+                                        for collection_id in collection_ids)
+
+            for table, rows in ((PaperAuthors, author_links), (PaperTags, tag_links),
+                                (PaperCollections, collection_links)):
+                if rows:
+                    db.execute(insert(table), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _index_vectors(self, items, timer: StageTimer):
+        start = time.perf_counter()
+        added = 0
+        for item in items:
+            if item["chunks"]:
+                self.vector_store.add_paper(item["paper_id"], [chunk["text"] for chunk in item["chunks"]],
+                                            item["embeddings"], provenance_array(item["chunks"]))
+                added += len(item["chunks"])
+        self.vector_store.maintain()
+        timer.record("index", start, time.perf_counter(), added)
+
+        if self.paper_vectors is not None:
+            start = time.perf_counter()
+            indexed = self.paper_vectors.upsert([(item["paper_id"], item["paper_text"]) for item in items])
+            timer.record("paper_vectors", start, time.perf_counter(), indexed)
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{report['found']} PDFs found in {report['source']}: {len(report['imported'])} imported, "
+          f"{len(report['duplicates'])} already in the library, {len(report['failed'])} failed")
+    print(f"{'stage':<10}{'items':>8}{'seconds':>10}{'busy s':>10}{'items/s':>10}")
+    for stage, stats in report["stages"].items():
+        per_second = stats["per_second"] if stats["per_second"] is not None else "-"
+        print(f"{stage:<10}{stats['items']:>8}{stats['seconds']:>10}{stats['busy_seconds']:>10}{per_second:>10}")
+    print(f"total {report['total_seconds']}s, {report['papers_per_second']} papers/s")
+    for failure in report["failed"]:
+        print(f"  failed {failure['file']}: {failure['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="folder or zip archive of PDFs")
+    parser.add_argument("--no-keywords", action="store_true",
+                        help="skip LLM keyword extraction for papers without keywords")
+    parser.add_argument("--collection", action="append", default=[],
+                        help="add every imported paper to this collection (repeatable)")
+    args = parser.parse_args()
+
+    # Importing the app builds the importer; the vector store is loaded explicitly
+    from backend.app import main as server
+    server.load_index_and_metadata()
+    server.load_paper_vectors()
+    report = server.bulk_importer.run(args.source, extract_keywords=not args.no_keywords,
+                                      collections=args.collection)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
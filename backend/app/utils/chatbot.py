@@ -1,26 +1,45 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from crewai import Agent, Task, Crew
-from crewai import LLM
+from typing import List, Dict, Any, Iterator
 import os
 import json
 import sys
-from langchain_groq import ChatGroq
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import GROQ_API_KEY
 
-from crewai import Agent, Task
+from .answer_cache import AnswerCache, answer_key
+from .lru_cache import normalize_query
+from .lazy import LazyResource
+
+LLM_MODEL = "groq/gemma2-9b-it"
+# Bump when the agent or task prompt changes so cached answers are not reused
+PROMPT_VERSION = "1"
+# CHATBOT_LLM=stub answers locally without calling Groq (offline work and tests)
+CHATBOT_LLM = os.getenv("CHATBOT_LLM", "groq")
+# Per-token delay of the stub, to mimic generation speed when measuring streaming
+CHATBOT_STUB_TOKEN_DELAY = float(os.getenv("CHATBOT_STUB_TOKEN_DELAY", 0.02))
 
 class ContextAnswererCrew:
     def __init__(self):
+        # CrewAI and LangChain take seconds to import, so they are only pulled in
+        # when the crew is first built (see context_crew below)
+        from langchain_groq import ChatGroq
+        from config import GROQ_API_KEY
+
         self.llm = ChatGroq(
-            model="groq/gemma2-9b-it",
+            model=LLM_MODEL,
             api_key=GROQ_API_KEY
         ) 
+        # Called directly (not through CrewAI) for token streaming, which wants the bare model name
+        self.stream_llm = ChatGroq(
+            model=LLM_MODEL.removeprefix("groq/"),
+            api_key=GROQ_API_KEY,
+            streaming=True
+        )
 
     def context_answering_agent(self):
+        from crewai import Agent
         return Agent(
             role="Academic Context Answerer",
             goal="""
@@ -52,7 +71,7 @@ class ContextAnswererCrew:
         )
 
 
-    def context_answering_task(self, agent, query: str, top_sections: List[Dict[str, Any]]):
+    def context_answering_prompt(self, query: str, top_sections: List[Dict[str, Any]]) -> str:
         """
         top_sections: List of dicts with 'section_text' and 'similarity_score' fields.
         """
@@ -60,8 +79,7 @@ class ContextAnswererCrew:
             f"### Section (Score: {s['similarity_score']}):\n{s['text']}" for s in top_sections
         ])
 
-        return Task(
-            description=f"""
+        return f"""
                 You are given a **user query** and the **two most relevant sections** of a research paper, 
                 each accompanied by a similarity score.
 
@@ -84,22 +102,94 @@ class ContextAnswererCrew:
 
                 Your response should be clear, well-structured, and grounded in the provided context. 
                 Avoid using knowledge beyond what's given in the sections unless necessary for clarity.
-            """,
+            """
+
+    def context_answering_task(self, agent, query: str, top_sections: List[Dict[str, Any]]):
+        from crewai import Task
+        return Task(
+            description=self.context_answering_prompt(query, top_sections),
             agent=agent,
             expected_output="A clear, detailed explanation or answer based on the two most relevant sections and the user's query.",
             async_execution=False,
         )
 
     
-context_crew = ContextAnswererCrew()
-
-def answer_user_query(query, top_sections):
+context_crew = LazyResource("chat LLM", ContextAnswererCrew)
+answer_cache = AnswerCache()
+
+def stub_answer(query, top_sections):
+    sources = ", ".join(f"paper {s['paper_id']} chunk {s['vector_id']}" for s in top_sections)
+    return f"Stub answer to '{query}' from {sources or 'no sections'}."
+
+def generate_answer(query, top_sections):
+    if CHATBOT_LLM == "stub":
+        # Same total time as the streamed stub, so the two can be compared
+        return "".join(stream_stub_answer(query, top_sections))
+    from crewai import Crew
+    crew = context_crew.get()
+    agent = crew.context_answering_agent()
+    task = crew.context_answering_task(agent, query=query, top_sections=top_sections)
+    answering_crew = Crew(agents=[agent], tasks=[task], verbose=False)
+    answer_result = answering_crew.kickoff()
+    return answer_result.raw
+
+def stream_stub_answer(query, top_sections) -> Iterator[str]:
+    for i, word in enumerate(stub_answer(query, top_sections).split(" ")):
+        time.sleep(CHATBOT_STUB_TOKEN_DELAY)
+        yield (" " if i else "") + word
+
+def stream_generated_answer(query, top_sections) -> Iterator[str]:
+    """Yield answer tokens as the model produces them, with the same prompt the crew uses."""
+    if CHATBOT_LLM == "stub":
+        yield from stream_stub_answer(query, top_sections)
+        return
+    crew = context_crew.get()
+    agent = crew.context_answering_agent()
+    messages = [
+        ("system", f"You are an {agent.role}.\n{agent.goal}\n{agent.backstory}"),
+        ("human", crew.context_answering_prompt(query, top_sections)),
+    ]
+    for chunk in crew.stream_llm.stream(messages):
+        if chunk.content:
+            yield chunk.content
+
+def stream_answer(query, top_sections, use_cache=True) -> Iterator[str]:
+    """
+    Streaming counterpart of answer_user_query. A cached answer comes back as a
+    single piece; a generated one is cached once the stream completes.
+    """
+    use_cache = use_cache and answer_cache.enabled
+    if use_cache:
+        model = "stub" if CHATBOT_LLM == "stub" else LLM_MODEL
+        key = answer_key(normalize_query(query), [s["vector_id"] for s in top_sections],
+                         PROMPT_VERSION, model)
+        cached = answer_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    pieces = []
+    for token in stream_generated_answer(query, top_sections):
+        pieces.append(token)
+        yield token
+    if use_cache:
+        answer_cache.put(key, "".join(pieces))
+
+def answer_user_query(query, top_sections, use_cache=True):
     try:
-        agent = context_crew.context_answering_agent()
-        task = context_crew.context_answering_task(agent, query=query, top_sections=top_sections)
-        answering_crew = Crew(agents=[agent], tasks=[task], verbose=False)
-        answer_result = answering_crew.kickoff()
-        return answer_result.raw
+        use_cache = use_cache and answer_cache.enabled
+        if use_cache:
+            model = "stub" if CHATBOT_LLM == "stub" else LLM_MODEL
+            key = answer_key(normalize_query(query), [s["vector_id"] for s in top_sections],
+                             PROMPT_VERSION, model)
+            cached = answer_cache.get(key)
+            if cached is not None:
+                return cached
+
+        answer = generate_answer(query, top_sections)
+        if use_cache:
+            answer_cache.put(key, answer)
+        return answer
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
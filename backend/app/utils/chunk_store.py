@@ -0,0 +1,259 @@
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Set
+import mmap
+import os
+import numpy as np
+
+TEXTS_NAME = "texts.bin"
+OFFSETS_NAME = "offsets.npy"
+VECTOR_IDS_NAME = "vector_ids.npy"
+PAPER_IDS_NAME = "paper_ids.npy"
+VECTORS_NAME = "vectors.npy"
+PROVENANCE_NAME = "provenance.npy"
+
+# Columns of the provenance array; -1 where unknown (chunks ingested before it was kept)
+PROVENANCE_FIELDS = ("page_start", "page_end", "char_start", "char_end")
+
+COPY_BLOCK_BYTES = 16 * 1024 * 1024
+COPY_BLOCK_ROWS = 8192
+
+
+def provenance_array(chunks: List[Dict[str, Any]]) -> np.ndarray:
+    """(n, 4) int64 provenance of chunk records from utils/pdf_text.py."""
+    return np.array([[chunk.get(field, -1) for field in PROVENANCE_FIELDS] for chunk in chunks],
+                    dtype='int64').reshape(len(chunks), len(PROVENANCE_FIELDS))
+
+
+class ChunkStore:
+    """
+    Columnar chunk store.
+
+    A snapshot is a set of files: every chunk's UTF-8 text concatenated in
+    texts.bin, an int64 offsets array (n + 1 entries) into it, parallel int64
+    arrays of vector ids (ascending) and paper ids, an n x 4 int64 provenance
+    array (page range and character offsets of each chunk in its PDF), and the
+    raw float32 embeddings (n x dimension). All of them are memory-mapped, so opening a snapshot costs the
+    same regardless of how many chunks it holds and only the pages of chunks that
+    are actually read get touched. The raw embeddings are the source of truth for
+    rebuilding or retraining the FAISS index, whatever lossy encoding it uses.
+    Chunks added since the snapshot live in a small in-memory tail until the next
+    snapshot is written.
+    """
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self._texts: Optional[mmap.mmap] = None
+        self._texts_file = None
+        self.offsets = np.zeros(1, dtype='int64')
+        self.vector_ids = np.zeros(0, dtype='int64')
+        self.paper_ids = np.zeros(0, dtype='int64')
+        self.vectors = np.zeros((0, dimension), dtype='float32')
+        self.provenance = np.zeros((0, len(PROVENANCE_FIELDS)), dtype='int64')
+        # vector_id -> (paper_id, text, vector, provenance row)
+        self.tail: Dict[int, Tuple[int, str, np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.vector_ids) + len(self.tail)
+
+    @classmethod
+    def open(cls, directory: str, dimension: int) -> "ChunkStore":
+        store = cls(dimension)
+        store.offsets = np.load(os.path.join(directory, OFFSETS_NAME), mmap_mode='r')
+        store.vector_ids = np.load(os.path.join(directory, VECTOR_IDS_NAME), mmap_mode='r')
+        store.paper_ids = np.load(os.path.join(directory, PAPER_IDS_NAME), mmap_mode='r')
+
+        vectors_path = os.path.join(directory, VECTORS_NAME)
+        store.vectors = np.load(vectors_path, mmap_mode='r') if os.path.exists(vectors_path) else None
+        provenance_path = os.path.join(directory, PROVENANCE_NAME)
+        # Snapshots written before provenance was kept have none
+        store.provenance = np.load(provenance_path, mmap_mode='r') if os.path.exists(provenance_path) else None
+
+        texts_path = os.path.join(directory, TEXTS_NAME)
+        if os.path.getsize(texts_path) > 0:
+            store._texts_file = open(texts_path, "rb")
+            store._texts = mmap.mmap(store._texts_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return store
+
+    def close(self):
+        # Open maps keep their files alive (and undeletable on Windows)
+        self.offsets = np.zeros(1, dtype='int64')
+        self.vector_ids = np.zeros(0, dtype='int64')
+        self.paper_ids = np.zeros(0, dtype='int64')
+        self.vectors = np.zeros((0, self.dimension), dtype='float32')
+        self.provenance = np.zeros((0, len(PROVENANCE_FIELDS)), dtype='int64')
+        if self._texts is not None:
+            self._texts.close()
+            self._texts = None
+        if self._texts_file is not None:
+            self._texts_file.close()
+            self._texts_file = None
+
+    def add(self, vector_ids: List[int], paper_id: int, texts: List[str], vectors: np.ndarray,
+            provenance: Optional[np.ndarray] = None):
+        if provenance is None:
+            provenance = np.full((len(vector_ids), len(PROVENANCE_FIELDS)), -1, dtype='int64')
+        for vector_id, text, vector, row in zip(vector_ids, texts, vectors, provenance):
+            self.tail[vector_id] = (paper_id, text, vector, row)
+
+    def _position(self, vector_id: int) -> int:
+        pos = int(np.searchsorted(self.vector_ids, vector_id))
+        if pos < len(self.vector_ids) and self.vector_ids[pos] == vector_id:
+            return pos
+        return -1
+
+    def _text_at(self, pos: int) -> str:
+        start, end = int(self.offsets[pos]), int(self.offsets[pos + 1])
+        return self._texts[start:end].decode("utf-8")
+
+    @staticmethod
+    def _provenance_fields(row) -> Dict[str, Optional[int]]:
+        return {field: (int(value) if value >= 0 else None) for field, value in zip(PROVENANCE_FIELDS, row)}
+
+    def get(self, vector_id: int) -> Optional[Dict[str, Any]]:
+        if vector_id in self.tail:
+            paper_id, text, _, row = self.tail[vector_id]
+            return {"paper_id": paper_id, "text": text, **self._provenance_fields(row)}
+
+        pos = self._position(vector_id)
+        if pos < 0:
+            return None
+        row = self.provenance[pos] if self.provenance is not None else [-1] * len(PROVENANCE_FIELDS)
+        return {"paper_id": int(self.paper_ids[pos]), "text": self._text_at(pos), **self._provenance_fields(row)}
+
+    def text_bytes(self, start_id: int, end_id: int) -> int:
+        """UTF-8 size of the texts of chunks with vector ids in [start_id, end_id)."""
+        lo, hi = np.searchsorted(self.vector_ids, [start_id, end_id])
+        size = int(self.offsets[hi]) - int(self.offsets[lo])
+        first_tail_id = int(self.vector_ids[-1]) + 1 if len(self.vector_ids) else 0
+        for vector_id in range(max(start_id, first_tail_id), end_id):
+            if vector_id in self.tail:
+                size += len(self.tail[vector_id][1].encode("utf-8"))
+        return size
+
+    def vectors_for(self, vector_ids: np.ndarray) -> np.ndarray:
+        """Raw embeddings of the given (ascending, existing) vector ids."""
+        out = np.empty((len(vector_ids), self.dimension), dtype='float32')
+        positions = np.searchsorted(self.vector_ids, vector_ids)
+        in_snapshot = positions < len(self.vector_ids)
+        in_snapshot[in_snapshot] = self.vector_ids[positions[in_snapshot]] == vector_ids[in_snapshot]
+        if in_snapshot.any():
+            out[in_snapshot] = self.vectors[positions[in_snapshot]]
+        for row in np.flatnonzero(~in_snapshot):
+            out[row] = self.tail[int(vector_ids[row])][2]
+        return out
+
+    def iter_vectors(self, block_rows: int = COPY_BLOCK_ROWS) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (vector_ids, vectors) blocks covering every chunk in id order."""
+        for start in range(0, len(self.vector_ids), block_rows):
+            end = min(start + block_rows, len(self.vector_ids))
+            yield np.asarray(self.vector_ids[start:end]), np.asarray(self.vectors[start:end])
+        if self.tail:
+            tail_ids = sorted(self.tail)
+            yield (np.array(tail_ids, dtype='int64'),
+                   np.stack([self.tail[vector_id][2] for vector_id in tail_ids]).astype('float32'))
+
+    def sample_vectors(self, count: int, seed: int = 0) -> np.ndarray:
+        """Up to `count` embeddings drawn uniformly from all chunks, e.g. for index training."""
+        total = len(self)
+        if total <= count:
+            return np.concatenate([block for _, block in self.iter_vectors()]) if total else \
+                np.zeros((0, self.dimension), dtype='float32')
+        rows = np.sort(np.random.default_rng(seed).choice(total, size=count, replace=False))
+        base = len(self.vector_ids)
+        tail_ids = sorted(self.tail)
+        snapshot_rows = rows[rows < base]
+        sample = [np.asarray(self.vectors[snapshot_rows])]
+        sample.extend(self.tail[tail_ids[row - base]][2][None, :] for row in rows[rows >= base])
+        return np.concatenate(sample).astype('float32')
+
+    def paper_groups(self, exclude: Optional[Set[int]] = None) -> Dict[int, List[int]]:
+        """
+        Map every paper id to the vector ids of its chunks, in ascending order,
+        leaving out the vector ids in `exclude` (e.g. tombstoned ones).
+        """
+        exclude = exclude or set()
+        groups: Dict[int, List[int]] = {}
+        if len(self.vector_ids):
+            vector_ids = np.asarray(self.vector_ids)
+            paper_ids = np.asarray(self.paper_ids)
+            if exclude:
+                live = ~np.isin(vector_ids, np.fromiter(exclude, dtype='int64', count=len(exclude)))
+                vector_ids, paper_ids = vector_ids[live], paper_ids[live]
+            order = np.argsort(paper_ids, kind='stable')
+            papers, starts = np.unique(paper_ids[order], return_index=True)
+            for paper_id, ids in zip(papers.tolist(), np.split(vector_ids[order], starts[1:])):
+                groups[paper_id] = ids.tolist()
+        for vector_id in sorted(self.tail):
+            if vector_id not in exclude:
+                groups.setdefault(self.tail[vector_id][0], []).append(vector_id)
+        return groups
+
+    def write(self, directory: str, exclude: Optional[np.ndarray] = None):
+        """
+        Write snapshot rows plus the tail as a new snapshot in `directory`, leaving out
+        the vector ids in `exclude`. Surviving snapshot rows are copied as contiguous
+        runs in fixed-size blocks, so the whole corpus is never held in memory.
+        """
+        if exclude is None:
+            exclude = np.zeros(0, dtype='int64')
+        snapshot_ids = np.asarray(self.vector_ids)
+        keep = ~np.isin(snapshot_ids, exclude)
+        # [start, end) row ranges of consecutive surviving rows
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], keep.astype('int8'), [0]))))
+        runs = list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+        exclude_set = set(exclude.tolist())
+        tail_ids = [vector_id for vector_id in sorted(self.tail) if vector_id not in exclude_set]
+        base = int(keep.sum())
+        count = base + len(tail_ids)
+        offsets = np.empty(count + 1, dtype='int64')
+        vector_ids = np.empty(count, dtype='int64')
+        paper_ids = np.empty(count, dtype='int64')
+        provenance = np.empty((count, len(PROVENANCE_FIELDS)), dtype='int64')
+        offsets[0] = 0
+        vectors = np.lib.format.open_memmap(
+            os.path.join(directory, VECTORS_NAME), mode='w+', dtype='float32',
+            shape=(count, self.dimension)
+        )
+
+        with open(os.path.join(directory, TEXTS_NAME), "wb") as out:
+            row = 0
+            for start, end in runs:
+                byte_start, byte_end = int(self.offsets[start]), int(self.offsets[end])
+                while byte_start < byte_end:
+                    block_end = min(byte_start + COPY_BLOCK_BYTES, byte_end)
+                    out.write(self._texts[byte_start:block_end])
+                    byte_start = block_end
+                length = end - start
+                offsets[row + 1:row + length + 1] = (
+                    np.asarray(self.offsets[start + 1:end + 1]) - int(self.offsets[start]) + offsets[row]
+                )
+                vector_ids[row:row + length] = self.vector_ids[start:end]
+                paper_ids[row:row + length] = self.paper_ids[start:end]
+                provenance[row:row + length] = self.provenance[start:end] if self.provenance is not None else -1
+                for block in range(start, end, COPY_BLOCK_ROWS):
+                    block_stop = min(block + COPY_BLOCK_ROWS, end)
+                    vectors[row + block - start:row + block_stop - start] = self.vectors[block:block_stop]
+                row += length
+
+            for vector_id in tail_ids:
+                paper_id, text, vector, provenance_row = self.tail[vector_id]
+                data = text.encode("utf-8")
+                out.write(data)
+                offsets[row + 1] = offsets[row] + len(data)
+                vector_ids[row] = vector_id
+                paper_ids[row] = paper_id
+                provenance[row] = provenance_row
+                vectors[row] = vector
+                row += 1
+            out.flush()
+            os.fsync(out.fileno())
+
+        vectors.flush()
+        del vectors
+
+        for name, array in ((OFFSETS_NAME, offsets), (VECTOR_IDS_NAME, vector_ids),
+                            (PAPER_IDS_NAME, paper_ids), (PROVENANCE_NAME, provenance)):
+            with open(os.path.join(directory, name), "wb") as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
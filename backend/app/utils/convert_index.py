@@ -0,0 +1,112 @@
+"""
+Convert a vector index to another storage mode, e.g. to a quantized one that
+takes a fraction of the memory of float32 vectors:
+
+    python -m backend.app.utils.convert_index faiss_index.bin --mode sq_int8
+    python -m backend.app.utils.convert_index vector_store --mode sq_fp16
+
+The source is either a FAISS index file (a pre-WAL faiss_index.bin, whose
+vector ids are its row positions) or a vector store directory. A file is
+rewritten in place, the original kept as <file>.bak, unless --output is
+given. A store gets a new snapshot generation with the converted index; its
+raw float32 embeddings are kept, so it can be converted back at any time.
+
+Stores are also converted on startup when VECTOR_INDEX_MODE names another
+mode; converting ahead of time keeps that rebuild out of the API's startup.
+Start the API with the same VECTOR_INDEX_MODE afterwards, or it converts the
+store back.
+"""
+import argparse
+import json
+import os
+import shutil
+import numpy as np
+import faiss
+
+from .index_factory import INDEX_MODES, build_index, index_kind, ivf_nlist, training_size
+from .vector_store import VectorStore, MANIFEST_NAME
+
+# Vectors reconstructed from the source index per add to the new one
+CONVERT_BLOCK_ROWS = 65536
+
+
+def index_mb(index) -> float:
+    return len(faiss.serialize_index(index)) / 1e6
+
+
+def index_ids(index) -> np.ndarray:
+    """Vector ids of a flat or ID-mapped index; a plain flat index's ids are its row positions."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.vector_to_array(index.id_map).astype('int64')
+    if not isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+        raise ValueError("only flat and ID-mapped index files can be converted; "
+                         "convert the vector store directory instead")
+    return np.arange(index.ntotal, dtype='int64')
+
+
+def convert_index_file(path: str, mode: str, output: str = None):
+    index = faiss.read_index(path)
+    ids = index_ids(index)
+    if index_kind(index)[0] in ("sq_fp16", "sq_int8"):
+        print("Note: the source index is quantized; its quantization error carries over")
+
+    nlist = ivf_nlist(index.ntotal) if mode in ("ivf_flat", "ivf_pq") else 0
+    training = None
+    if training_size(mode, nlist):
+        size = min(index.ntotal, training_size(mode, nlist))
+        sample = np.sort(np.random.default_rng(0).choice(ids, size=size, replace=False))
+        training = index.reconstruct_batch(sample)
+
+    converted = build_index(mode, index.d, nlist, training)
+    for first in range(0, len(ids), CONVERT_BLOCK_ROWS):
+        block = ids[first:first + CONVERT_BLOCK_ROWS]
+        converted.add_with_ids(index.reconstruct_batch(block), block)
+
+    output = output or path
+    if output == path:
+        shutil.copy2(path, path + ".bak")
+    tmp = output + ".tmp"
+    faiss.write_index(converted, tmp)
+    os.replace(tmp, output)
+    print(f"Converted {path} ({index_kind(index)[0]}, {index_mb(index):.1f} MB) to {output} "
+          f"({mode}, {index_mb(converted):.1f} MB), {converted.ntotal} vectors")
+
+
+def convert_store(directory: str, mode: str):
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        generation = json.load(f)["generation"]
+    index = faiss.read_index(os.path.join(directory, f"snapshot-{generation:06d}", "index.faiss"))
+    before = index_kind(index)[0]
+
+    # Loading a store under another mode rebuilds its index from the raw
+    # embeddings and compacts it into a new generation
+    store = VectorStore(index.d, directory, mode)
+    store.load()
+    kind = index_kind(store.index)[0]
+    if kind != mode:
+        print(f"{store.ntotal} vectors are too few for {mode}; the index stays {kind} until the store grows")
+    float32_mb = store.ntotal * store.dimension * 4 / 1e6
+    print(f"Converted {directory} from {before} to {kind}: {index_mb(store.index):.1f} MB for "
+          f"{store.ntotal} vectors ({float32_mb:.1f} MB as float32)")
+    store.wal.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="FAISS index file or vector store directory")
+    parser.add_argument("--mode", required=True, choices=INDEX_MODES)
+    parser.add_argument("--output", help="write a converted index file here instead of in place")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        if not os.path.exists(os.path.join(args.source, MANIFEST_NAME)):
+            parser.error(f"{args.source} is not a vector store (no {MANIFEST_NAME})")
+        if args.output:
+            parser.error("--output only applies to index files; stores are converted in place")
+        convert_store(args.source, args.mode)
+    else:
+        convert_index_file(args.source, args.mode, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from typing import Dict, Any, Optional
+from collections import deque
+import asyncio
+import os
+import random
+import time
+import numpy as np
+import httpx
+
+# GROBID processes at most this many documents at once (its concurrency setting,
+# 10 by default); more in-flight calls only make it answer 503.
+GROBID_CONCURRENCY = int(os.getenv("GROBID_CONCURRENCY", 4))
+# Callers waiting for a free slot beyond this are turned away instead of queued
+GROBID_MAX_QUEUE = int(os.getenv("GROBID_MAX_QUEUE", 32))
+GROBID_TIMEOUT = float(os.getenv("GROBID_TIMEOUT", 120))
+GROBID_MAX_RETRIES = int(os.getenv("GROBID_MAX_RETRIES", 4))
+GROBID_BACKOFF = float(os.getenv("GROBID_BACKOFF", 0.5))
+
+# Form fields sent with every processFulltextDocument call: sentence segmentation
+# plus page coordinates of sentences and headings, which utils/tei_text.py turns
+# into chunk page ranges
+GROBID_FULLTEXT_OPTIONS = {"segmentSentences": "1", "teiCoordinates": ["s", "head"]}
+
+TIMING_WINDOW = 200
+
+
+class GrobidError(Exception):
+    pass
+
+
+class GrobidBusyError(GrobidError):
+    """Raised without calling GROBID when too many extractions are already queued."""
+
+
+class GrobidClient:
+    """
+    Async GROBID client sharing one pooled HTTP connection set across requests.
+
+    A semaphore caps in-flight calls at GROBID's own concurrency, further callers
+    queue up to GROBID_MAX_QUEUE and are rejected after that. A 503 (GROBID's
+    "all workers busy") is retried with exponential backoff and jitter, honouring
+    Retry-After when present. Queue wait and call time are kept for stats().
+    """
+
+    def __init__(self, url: str, concurrency: int = GROBID_CONCURRENCY, max_queue: int = GROBID_MAX_QUEUE,
+                 timeout: float = GROBID_TIMEOUT, max_retries: int = GROBID_MAX_RETRIES,
+                 backoff: float = GROBID_BACKOFF):
+        self.url = url
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._in_flight = 0
+        self._counts = {"calls": 0, "failures": 0, "retries": 0, "rejected": 0}
+        self._call_seconds = deque(maxlen=TIMING_WINDOW)
+        self._wait_seconds = deque(maxlen=TIMING_WINDOW)
+
+    def _ensure_started(self):
+        # Created on first use so both belong to the server's running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=self.concurrency,
+                                    max_keepalive_connections=self.concurrency)
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def process_fulltext(self, filename: str, pdf_path: str) -> bytes:
+        """Return GROBID's TEI XML for the PDF at pdf_path, which is streamed rather than read into memory."""
+        self._ensure_started()
+        if self._waiting >= self.max_queue:
+            self._counts["rejected"] += 1
+            raise GrobidBusyError("Too many PDFs are waiting for GROBID, try again shortly")
+
+        queued = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await self._post_with_retry(filename, pdf_path)
+        except Exception:
+            self._counts["failures"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+            finished = time.perf_counter()
+            self._counts["calls"] += 1
+            self._wait_seconds.append(started - queued)
+            self._call_seconds.append(finished - started)
+            print(f"GROBID {filename}: {finished - started:.2f}s (queued {started - queued:.2f}s)")
+
+    async def _post_with_retry(self, filename: str, pdf_path: str) -> bytes:
+        for attempt in range(self.max_retries + 1):
+            try:
+                # httpx sends the multipart body from the open file in small chunks
+                with open(pdf_path, "rb") as f:
+                    resp = await self._client.post(
+                        self.url, data=GROBID_FULLTEXT_OPTIONS,
+                        files={"input": (filename, f, "application/pdf")}
+                    )
+            except httpx.HTTPError as e:
+                raise GrobidError(f"GROBID request failed: {e}") from e
+
+            if resp.status_code != 503 or attempt == self.max_retries:
+                break
+            self._counts["retries"] += 1
+            await asyncio.sleep(self._retry_delay(resp, attempt))
+
+        if resp.status_code != 200:
+            raise GrobidError(f"Grobid error ({resp.status_code}): " + resp.text[:200])
+        return resp.content
+
+    def _retry_delay(self, resp: httpx.Response, attempt: int) -> float:
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def stats(self) -> Dict[str, Any]:
+        def percentiles(samples):
+            if not samples:
+                return {"p50_ms": None, "p95_ms": None}
+            return {"p50_ms": round(float(np.percentile(samples, 50)) * 1000, 1),
+                    "p95_ms": round(float(np.percentile(samples, 95)) * 1000, 1)}
+
+        return {
+            **self._counts,
+            "concurrency": self.concurrency,
+            "in_flight": self._in_flight,
+            "queued": self._waiting,
+            "call": percentiles(list(self._call_seconds)),
+            "queue_wait": percentiles(list(self._wait_seconds)),
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,150 @@
+from typing import Optional, Tuple
+import math
+import os
+import numpy as np
+import faiss
+
+INDEX_MODES = ("flat", "ivf_flat", "hnsw", "ivf_pq", "sq_fp16", "sq_int8")
+
+# Exhaustive search over scalar-quantized codes: float16 halves the memory of
+# flat float32 vectors, int8 quarters it
+SCALAR_QUANTIZERS = {
+    "sq_fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq_int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+# IVF modes stay flat until there are enough vectors to train their coarse
+# quantizer (FAISS wants ~39 points per centroid); HNSW only pays off on larger
+# corpora, so it also starts flat.
+IVF_MIN_TRAIN_VECTORS = int(os.getenv("VECTOR_IVF_MIN_TRAIN", 20000))
+HNSW_MIN_VECTORS = int(os.getenv("VECTOR_HNSW_MIN", 10000))
+
+# IVF indexes are retrained once the corpus grows enough that the ideal number
+# of lists is this many times what the index was trained with.
+IVF_RETRAIN_GROWTH = 4
+
+IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", 16))
+HNSW_M = int(os.getenv("VECTOR_HNSW_M", 32))
+HNSW_EF_CONSTRUCTION = int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", 80))
+HNSW_EF_SEARCH = int(os.getenv("VECTOR_HNSW_EF_SEARCH", 64))
+PQ_SUBQUANTIZERS = int(os.getenv("VECTOR_PQ_M", 64))
+PQ_BITS = 8
+
+# int8 quantization learns each dimension's value range from a sample; below
+# this many vectors the index stays flat
+SQ_MIN_TRAIN_VECTORS = int(os.getenv("VECTOR_SQ_MIN_TRAIN", 1000))
+SQ_TRAINING_VECTORS = 65536
+
+
+def ivf_nlist(ntotal: int) -> int:
+    """Number of inverted lists for a corpus of ntotal vectors (~4 * sqrt(n), power of two)."""
+    target = 4 * math.sqrt(max(ntotal, 1))
+    return int(min(65536, max(16, 2 ** round(math.log2(target)))))
+
+
+def index_kind(index) -> Tuple[str, int]:
+    """Return (mode, nlist) describing a built index; nlist is 0 for non-IVF modes."""
+    if isinstance(index, faiss.IndexIDMap2):
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexScalarQuantizer):
+            for mode, qtype in SCALAR_QUANTIZERS.items():
+                if inner.sq.qtype == qtype:
+                    return mode, 0
+        return ("hnsw", 0) if isinstance(inner, faiss.IndexHNSW) else ("flat", 0)
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq", index.nlist
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat", index.nlist
+    return "flat", 0
+
+
+def plan_index(mode: str, ntotal: int, current=None) -> Tuple[str, int]:
+    """
+    Decide which (mode, nlist) the index should have for a corpus of ntotal vectors
+    when `mode` is configured. Returns the current kind unchanged when it is still
+    good enough, so callers only rebuild when the answer differs.
+    """
+    if mode not in INDEX_MODES:
+        raise ValueError(f"Unknown vector index mode '{mode}', expected one of {INDEX_MODES}")
+
+    current_kind = index_kind(current) if current is not None else ("flat", 0)
+
+    if mode == "flat":
+        return "flat", 0
+    if mode == "hnsw":
+        return ("hnsw", 0) if ntotal >= HNSW_MIN_VECTORS or current_kind[0] == "hnsw" else ("flat", 0)
+    if mode == "sq_fp16":
+        return "sq_fp16", 0
+    if mode == "sq_int8":
+        return ("sq_int8", 0) if ntotal >= SQ_MIN_TRAIN_VECTORS or current_kind[0] == "sq_int8" else ("flat", 0)
+
+    if ntotal < IVF_MIN_TRAIN_VECTORS and current_kind[0] != mode:
+        return "flat", 0
+    target_nlist = ivf_nlist(ntotal)
+    if current_kind[0] == mode and target_nlist < current_kind[1] * IVF_RETRAIN_GROWTH:
+        return current_kind
+    return mode, target_nlist
+
+
+def training_size(mode: str, nlist: int = 0) -> int:
+    """Number of sample vectors build_index wants to train an index of this kind (0: none)."""
+    if mode in ("ivf_flat", "ivf_pq"):
+        return nlist * 64
+    if mode == "sq_int8":
+        return SQ_TRAINING_VECTORS
+    return 0
+
+
+def build_index(mode: str, dimension: int, nlist: int = 0,
+                training_vectors: Optional[np.ndarray] = None):
+    """
+    Create an empty index of the given kind that accepts add_with_ids. IVF and
+    int8 kinds are trained on training_vectors before being returned.
+    """
+    if mode == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    if mode in SCALAR_QUANTIZERS:
+        sq = faiss.IndexScalarQuantizer(dimension, SCALAR_QUANTIZERS[mode], faiss.METRIC_INNER_PRODUCT)
+        if not sq.is_trained:
+            sq.train(training_vectors)
+        return faiss.IndexIDMap2(sq)
+
+    if mode == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        hnsw.hnsw.efSearch = HNSW_EF_SEARCH
+        return faiss.IndexIDMap2(hnsw)
+
+    quantizer = faiss.IndexFlatIP(dimension)
+    if mode == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+    elif mode == "ivf_pq":
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, PQ_SUBQUANTIZERS, PQ_BITS,
+                                 faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(f"Unknown vector index mode '{mode}'")
+
+    index.train(training_vectors)
+    return configure_index(index)
+
+
+def configure_index(index):
+    """Apply the configured query-time knobs (nprobe / efSearch) to a built or loaded index."""
+    mode, _ = index_kind(index)
+    if mode in ("ivf_flat", "ivf_pq"):
+        faiss.downcast_index(index).nprobe = IVF_NPROBE
+    elif mode == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+def search_parameters(index, selector=None):
+    """Search parameters of the right type for `index`, optionally restricted by an ID selector."""
+    mode, _ = index_kind(index)
+    if mode in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=faiss.downcast_index(index).nprobe)
+    if mode == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=HNSW_EF_SEARCH)
+    return faiss.SearchParameters(sel=selector)
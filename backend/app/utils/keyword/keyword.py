@@ -1,22 +1,29 @@
 import numpy as np
 import re
 import string
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.sequence import pad_sequences
 import pickle
 
-# Load model
-model = load_model('model.h5')
+from ..lazy import LazyResource
 
-# Load tokenizer and multilabel binarizer
-with open('tokenizer.pickle', 'rb') as handle:
-    token = pickle.load(handle)
+maxlen = 500  # As defined in your previous code
 
-with open('multilabel_binarizer.pickle', 'rb') as handle:
-    multilabel_binarizer = pickle.load(handle)
+class KeywordClassifier:
+    def __init__(self):
+        from tensorflow.keras.models import load_model
 
-maxlen = 500  # As defined in your previous code
+        # Load model
+        self.model = load_model('model.h5')
+
+        # Load tokenizer and multilabel binarizer
+        with open('tokenizer.pickle', 'rb') as handle:
+            self.token = pickle.load(handle)
+
+        with open('multilabel_binarizer.pickle', 'rb') as handle:
+            self.multilabel_binarizer = pickle.load(handle)
+
+# TensorFlow, the Keras model, tokenizer and binarizer are loaded together on the
+# first prediction rather than at import, which alone takes several seconds
+keyword_classifier = LazyResource("keyword classifier", KeywordClassifier)
 
 # Preprocessing
 def strip_links(text):
@@ -29,7 +36,8 @@ def strip_links(text):
 def remove_punctuations(text):
     return text.translate(str.maketrans('', '', string.punctuation))
 
-def preprocess_input(text):
+def preprocess_input(text, token):
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
     text = strip_links(text)
     text = text.replace("\n", ' ')
     text = remove_punctuations(text)
@@ -40,29 +48,31 @@ def preprocess_input(text):
 # Prediction function
 def predict_categories(title, abstract):
     full_text = title + '. ' + abstract
-    processed_text = preprocess_input(full_text)
-    prediction = model.predict(processed_text)
+    classifier = keyword_classifier.get()
+    processed_text = preprocess_input(full_text, classifier.token)
+    prediction = classifier.model.predict(processed_text)
     thresholded_prediction = prediction > 0.5
 
     if thresholded_prediction.any():
-        predicted_labels = multilabel_binarizer.inverse_transform(thresholded_prediction)
+        predicted_labels = classifier.multilabel_binarizer.inverse_transform(thresholded_prediction)
     else:
         max_label_index = prediction.argmax()
-        max_label = [multilabel_binarizer.classes_[max_label_index]]
+        max_label = [classifier.multilabel_binarizer.classes_[max_label_index]]
         predicted_labels = [max_label]
 
     return predicted_labels
 
 def extracts_keywords(full_text):
-    processed_text = preprocess_input(full_text)
-    prediction = model.predict(processed_text)
+    classifier = keyword_classifier.get()
+    processed_text = preprocess_input(full_text, classifier.token)
+    prediction = classifier.model.predict(processed_text)
     thresholded_prediction = prediction > 0.5
 
     if thresholded_prediction.any():
-        predicted_labels = multilabel_binarizer.inverse_transform(thresholded_prediction)
+        predicted_labels = classifier.multilabel_binarizer.inverse_transform(thresholded_prediction)
     else:
         max_label_index = prediction.argmax()
-        max_label = [multilabel_binarizer.classes_[max_label_index]]
+        max_label = [classifier.multilabel_binarizer.classes_[max_label_index]]
         predicted_labels = [max_label]
 
     return predicted_labels
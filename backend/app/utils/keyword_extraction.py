@@ -1,24 +1,23 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any
-from crewai import Agent, Task, Crew
-from crewai import LLM
 import os
 import json
 import sys
-from langchain_groq import ChatGroq
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import GROQ_API_KEY
 
-if not GROQ_API_KEY:
-    raise EnvironmentError("GROQ_API_KEY not found in .env file")
-
-
-from crewai import Agent, Task
+from .lazy import LazyResource
 
 class KeywordExtractorCrew:
     def __init__(self):
+        # Heavy imports deferred to first use, like the chat crew
+        from langchain_groq import ChatGroq
+        from config import GROQ_API_KEY
+
+        if not GROQ_API_KEY:
+            raise EnvironmentError("GROQ_API_KEY not found in .env file")
+
         self.llm = ChatGroq(
             model="groq/gemma2-9b-it",
             api_key=os.environ['GROQ_API_KEY']
@@ -26,6 +25,7 @@ class KeywordExtractorCrew:
         ) 
 
     def keyword_extraction_agent(self):
+        from crewai import Agent
         return Agent(
             role="Academic Keyword Extractor",
             goal="""
@@ -43,6 +43,7 @@ class KeywordExtractorCrew:
         )
 
     def keyword_extraction_task(self, agent, input_text: str):
+        from crewai import Task
         return Task(
             description=f"""
                 Given the following academic text (e.g., an abstract), extract exactly 3 keywords or keyphrases that best capture its central themes.
@@ -70,12 +71,14 @@ class KeywordExtractorCrew:
         )
 
 
-keyword_crew = KeywordExtractorCrew()
+keyword_crew = LazyResource("keyword LLM", KeywordExtractorCrew)
 
 def extract_keyword(text):
     try:
-        agent = keyword_crew.keyword_extraction_agent()
-        task = keyword_crew.keyword_extraction_task(agent, input_text=text)
+        from crewai import Crew
+        crew = keyword_crew.get()
+        agent = crew.keyword_extraction_agent()
+        task = crew.keyword_extraction_task(agent, input_text=text)
         extraction_crew = Crew(agents=[agent], tasks=[task], verbose=False)
         keywords_result = extraction_crew.kickoff()
         keywords_array = json.loads(keywords_result.raw)
@@ -0,0 +1,49 @@
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class LazyResource(Generic[T]):
+    """
+    A heavy object (model, LLM client) built on first use instead of at import.
+    get() loads it once, thread-safely, and the startup warmup calls it in the
+    background so the first request usually finds it ready. status() feeds the
+    readiness endpoint.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], T]):
+        self.name = name
+        self._loader = loader
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+        self.state = "not_loaded"
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def get(self) -> T:
+        if self._value is not None:
+            return self._value
+        with self._lock:
+            if self._value is None:
+                self.state = "loading"
+                started = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self.state = "ready"
+                self.error = None
+                print(f"Loaded {self.name} in {self.load_seconds}s")
+        return self._value
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
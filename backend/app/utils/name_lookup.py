@@ -0,0 +1,107 @@
+from typing import Dict, Iterable, List
+from sqlalchemy import insert, select, delete, update, func, inspect
+from sqlalchemy.dialects import mysql, sqlite
+
+from ..models import Author, Tags, Collection, PaperAuthors, PaperTags, PaperCollections
+
+IN_CLAUSE_BATCH = 1000
+
+# name table -> (junction table, junction column pointing at it)
+NAME_TABLES = (
+    (Author, PaperAuthors, "author_id"),
+    (Tags, PaperTags, "tag_id"),
+    (Collection, PaperCollections, "collection_id"),
+)
+
+
+def _primary_key(model):
+    return list(model.__table__.primary_key.columns)[0]
+
+
+def _insert_ignoring_existing(db, model, names: List[str]):
+    """INSERT the names, leaving rows whose name already exists (unique index) alone."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        # name = name: a no-op that keeps the spelling already stored
+        stmt = mysql.insert(model).on_duplicate_key_update(name=model.__table__.c.name)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(model).on_conflict_do_nothing(index_elements=["name"])
+    else:
+        existing = set(db.scalars(select(model.name).where(model.name.in_(names))))
+        names = [name for name in names if name not in existing]
+        stmt = insert(model)
+    if names:
+        db.execute(stmt, [{"name": name} for name in names])
+
+
+def resolve_name_ids(db, model, names: Iterable[str]) -> Dict[str, int]:
+    """
+    Map names to ids of `model` (Author, Tags or Collection), creating the missing
+    rows. One upsert and one SELECT per batch of names, inside the caller's
+    transaction; the unique index on name keeps concurrent inserts from
+    creating duplicates.
+    """
+    names = list(dict.fromkeys(name for name in names if name))
+    if not names:
+        return {}
+
+    pk = _primary_key(model)
+    found: Dict[str, int] = {}
+    for start in range(0, len(names), IN_CLAUSE_BATCH):
+        batch = names[start:start + IN_CLAUSE_BATCH]
+        _insert_ignoring_existing(db, model, batch)
+        found.update(db.execute(select(model.name, pk).where(model.name.in_(batch))).all())
+
+    # MySQL's default collation compares names case-insensitively, so the stored
+    # spelling may differ from the requested one
+    folded = {name.casefold(): row_id for name, row_id in found.items()}
+    return {name: found.get(name, folded.get(name.casefold())) for name in names}
+
+
+def link_names(db, junction, column: str, paper_id: int, ids: Iterable[int]):
+    rows = [{"paper_id": paper_id, column: row_id} for row_id in dict.fromkeys(ids) if row_id is not None]
+    if rows:
+        db.execute(insert(junction), rows)
+
+
+def _merge_duplicate_names(connection, model, junction, column: str):
+    """Fold rows sharing a name into the lowest id so a unique index can be built."""
+    pk = _primary_key(model)
+    link = getattr(junction, column)
+    groups = connection.execute(
+        select(model.name).group_by(model.name).having(func.count() > 1)
+    ).scalars().all()
+
+    for name in groups:
+        ids = sorted(connection.execute(select(pk).where(model.name == name)).scalars())
+        keeper, duplicates = ids[0], ids[1:]
+        linked = set(connection.execute(
+            select(junction.paper_id).where(link == keeper)).scalars())
+        for duplicate in duplicates:
+            papers = set(connection.execute(
+                select(junction.paper_id).where(link == duplicate)).scalars())
+            connection.execute(delete(junction).where(link == duplicate, junction.paper_id.in_(papers & linked)))
+            connection.execute(update(junction).where(link == duplicate).values({column: keeper}))
+            linked |= papers
+        connection.execute(delete(model).where(pk.in_(duplicates)))
+        print(f"Merged {len(duplicates)} duplicate {model.__tablename__} rows named '{name}'")
+
+
+def ensure_name_indexes(engine):
+    """
+    create_all() only creates missing tables, so databases created before the
+    name and junction indexes existed get them here, after merging any
+    duplicate names that would violate uniqueness.
+    """
+    inspector = inspect(engine)
+    for model, junction, column in NAME_TABLES:
+        for table, merge in ((model.__table__, True), (junction.__table__, False)):
+            present = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in present or index.dialect_kwargs.get("mysql_prefix") == "FULLTEXT":
+                    continue  # FULLTEXT indexes: see utils/paper_search.ensure_search_indexes
+                with engine.begin() as connection:
+                    if index.unique and merge:
+                        _merge_duplicate_names(connection, model, junction, column)
+                    index.create(bind=connection)
+                print(f"Created index {index.name} on {table.name}")
@@ -0,0 +1,77 @@
+from typing import List, Dict, Iterable, Tuple
+import os
+import numpy as np
+
+PAPER_INDEX_NAME = "paper_index.npy"
+
+RUN_DTYPE = np.dtype([("paper_id", "int64"), ("start", "int64"), ("count", "int64")])
+
+
+class PaperIndex:
+    """
+    Secondary index from paper id to the vector ids of its chunks.
+
+    Every ingest assigns a paper one block of consecutive vector ids, so a paper is
+    stored as a short list of (start, count) runs rather than one entry per chunk.
+    Existence checks, chunk counts and deletes are dict lookups, and expanding a
+    filter into vector ids costs only as much as the ids it returns. The index is
+    persisted next to each snapshot as a structured array with one row per run.
+    """
+
+    def __init__(self):
+        self.runs: Dict[int, List[Tuple[int, int]]] = {}
+
+    def __contains__(self, paper_id: int) -> bool:
+        return paper_id in self.runs
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def add(self, paper_id: int, start: int, count: int):
+        runs = self.runs.setdefault(paper_id, [])
+        if runs and runs[-1][0] + runs[-1][1] == start:
+            runs[-1] = (runs[-1][0], runs[-1][1] + count)
+        else:
+            runs.append((start, count))
+
+    def pop(self, paper_id: int) -> List[Tuple[int, int]]:
+        return self.runs.pop(paper_id, [])
+
+    def count(self, paper_id: int) -> int:
+        return sum(count for _, count in self.runs.get(paper_id, []))
+
+    def vector_ids(self, paper_ids: Iterable[int]) -> np.ndarray:
+        """Ascending vector ids of every chunk of the given papers."""
+        ranges = [np.arange(start, start + count, dtype='int64')
+                  for paper_id in set(paper_ids) for start, count in self.runs.get(paper_id, [])]
+        if not ranges:
+            return np.zeros(0, dtype='int64')
+        return np.sort(np.concatenate(ranges))
+
+    @staticmethod
+    def expand(runs: List[Tuple[int, int]]) -> List[int]:
+        return [vector_id for start, count in runs for vector_id in range(start, start + count)]
+
+    @classmethod
+    def from_groups(cls, groups: Dict[int, List[int]]) -> "PaperIndex":
+        """Build from paper id -> ascending vector ids, e.g. ChunkStore.paper_groups()."""
+        index = cls()
+        for paper_id, vector_ids in groups.items():
+            for vector_id in vector_ids:
+                index.add(paper_id, vector_id, 1)
+        return index
+
+    @classmethod
+    def load(cls, directory: str) -> "PaperIndex":
+        index = cls()
+        for paper_id, start, count in np.load(os.path.join(directory, PAPER_INDEX_NAME)).tolist():
+            index.runs.setdefault(paper_id, []).append((start, count))
+        return index
+
+    def save(self, directory: str):
+        rows = np.array([(paper_id, start, count)
+                         for paper_id, runs in self.runs.items() for start, count in runs], dtype=RUN_DTYPE)
+        with open(os.path.join(directory, PAPER_INDEX_NAME), "wb") as f:
+            np.save(f, rows)
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,215 @@
+"""
+Ranked full-text search over paper titles, abstracts, authors and tags.
+
+On MySQL the search runs on FULLTEXT indexes (declared in models.py) in boolean
+mode, so every word matches as a prefix ("transf" finds "transformers") and
+matching is an index lookup rather than a scan of every row. A paper's score
+sums the relevance of its title (weighted double), title + abstract, authors
+and tags. Every word of the query must match in at least one of those fields.
+
+Other databases (SQLite in development) have no such index: there the words
+are matched as substrings with LIKE and results come unranked, newest first.
+
+Query syntax, parsed by parse_search_query:
+    attention transformer          words, each matched as a prefix
+    "graph neural"                 a phrase
+    author:vaswani author:"N. Shazeer"
+    tag:nlp                        a tag starting with "nlp"
+"""
+from typing import List, NamedTuple
+import os
+import re
+
+from sqlalchemy import select, func, union_all, or_, inspect, literal
+from sqlalchemy.dialects.mysql import match
+
+from ..models import Paper, Author, Tags, PaperAuthors, PaperTags
+
+# Words shorter than InnoDB's innodb_ft_min_token_size are not in the index;
+# those are matched with LIKE instead
+SEARCH_MIN_TOKEN = int(os.getenv("SEARCH_MIN_TOKEN", 3))
+
+# Title matches count double: a query word in the title says more than one in the abstract
+TITLE_WEIGHT = 2.0
+
+# (table, FULLTEXT index name); the indexes themselves are declared in models.py
+SEARCH_INDEXES = (
+    (Paper.__table__, "ft_papers_title"),
+    (Paper.__table__, "ft_papers_title_abstract"),
+    (Author.__table__, "ft_authors_name"),
+    (Tags.__table__, "ft_tags_name"),
+)
+
+SEARCH_FIELDS = ("author", "tag")
+QUERY_TOKEN = re.compile(r'(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+# Words as the FULLTEXT parser sees them; everything else, including the
+# boolean mode operators (+-<>()~*"@), separates words
+WORD = re.compile(r'\w+')
+
+
+class SearchQuery(NamedTuple):
+    words: List[str]
+    phrases: List[str]
+    authors: List[str]
+    tags: List[str]
+
+    def __bool__(self):
+        return any(self)
+
+
+def parse_search_query(q: str) -> SearchQuery:
+    """Split a query into free words, quoted phrases and author:/tag: filters."""
+    query = SearchQuery([], [], [], [])
+    for field, quoted, bare in QUERY_TOKEN.findall(q or ""):
+        field = field.lower()
+        if field and field not in SEARCH_FIELDS:
+            # Not a filter ("e.g:", "http://..."), just text
+            bare = f"{field}:{bare}" if bare else f"{field}: {quoted}"
+            field, quoted = "", ""
+        value = (quoted if quoted else bare).strip()
+        if not value:
+            continue
+        if field == "author":
+            query.authors.append(value)
+        elif field == "tag":
+            query.tags.append(value.lower())
+        elif quoted and " " in value:
+            query.phrases.append(value)
+        else:
+            query.words.extend(WORD.findall(value))
+    return query
+
+
+def escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _contains(column, text: str):
+    return column.ilike(f"%{escape_like(text)}%", escape="\\")
+
+
+def _boolean_words(text: str) -> List[str]:
+    return WORD.findall(text)
+
+
+def _indexed(word: str) -> bool:
+    return len(word) >= SEARCH_MIN_TOKEN
+
+
+def boolean_mode_query(words: List[str], phrases: List[str] = (), required: bool = False) -> str:
+    """Boolean mode search string: words as prefixes ("word*"), phrases quoted."""
+    sign = "+" if required else ""
+    terms = [f"{sign}{word}*" for word in words]
+    terms += [f'{sign}"{" ".join(_boolean_words(phrase))}"' for phrase in phrases]
+    return " ".join(terms)
+
+
+def _fulltext(*columns, against: str):
+    return match(*columns, against=against).in_boolean_mode()
+
+
+def _term_filter(term: str, fulltext: bool, phrase: bool = False):
+    """A paper matches term in its title, abstract, authors or tags."""
+    if not fulltext or not (phrase or _indexed(term)):
+        return or_(
+            _contains(Paper.title, term),
+            _contains(Paper.abstract, term),
+            Paper.authors.any(_contains(Author.name, term)),
+            Paper.tags.any(_contains(Tags.name, term)),
+        )
+    against = boolean_mode_query([], [term], True) if phrase else boolean_mode_query([term], required=True)
+    return or_(
+        _fulltext(Paper.title, Paper.abstract, against=against),
+        Paper.authors.any(_fulltext(Author.name, against=against)),
+        Paper.tags.any(_fulltext(Tags.name, against=against)),
+    )
+
+
+def search_filters(query: SearchQuery, fulltext: bool) -> list:
+    """Conditions on Paper selecting the papers that match every part of the query."""
+    filters = [_term_filter(word, fulltext) for word in query.words]
+    filters += [_term_filter(phrase, fulltext, phrase=True) for phrase in query.phrases]
+    for author in query.authors:
+        words = _boolean_words(author)
+        if fulltext and words and all(_indexed(word) for word in words):
+            filters.append(Paper.authors.any(_fulltext(Author.name, against=boolean_mode_query(words, required=True))))
+        else:
+            filters.append(Paper.authors.any(_contains(Author.name, author)))
+    for tag in query.tags:
+        filters.append(Paper.tags.any(Tags.name.like(f"{escape_like(tag)}%", escape="\\")))
+    return filters
+
+
+def uses_fulltext(db) -> bool:
+    return db.get_bind().dialect.name == "mysql"
+
+
+def relevance_scores(query: SearchQuery):
+    """
+    Subquery of (paper_id, score) for the papers with at least one indexed
+    word or phrase in a searched field, or None when the query has none.
+    """
+    against = boolean_mode_query([word for word in query.words if _indexed(word)], query.phrases)
+    if not against:
+        return None
+
+    title = _fulltext(Paper.title, against=against)
+    title_abstract = _fulltext(Paper.title, Paper.abstract, against=against)
+    author = _fulltext(Author.name, against=against)
+    tag = _fulltext(Tags.name, against=against)
+    matches = union_all(
+        select(Paper.paper_id.label("paper_id"), (title * TITLE_WEIGHT).label("score")).where(title),
+        select(Paper.paper_id.label("paper_id"), title_abstract.label("score")).where(title_abstract),
+        select(PaperAuthors.paper_id.label("paper_id"), author.label("score"))
+            .join(Author, Author.author_id == PaperAuthors.author_id).where(author),
+        select(PaperTags.paper_id.label("paper_id"), tag.label("score"))
+            .join(Tags, Tags.tag_id == PaperTags.tag_id).where(tag),
+    ).subquery()
+    return (
+        select(matches.c.paper_id, func.sum(matches.c.score).label("score"))
+        .group_by(matches.c.paper_id)
+        .subquery()
+    )
+
+
+def rank_papers(db, query: SearchQuery, filters: list, limit: int, offset: int = 0):
+    """
+    One page of the papers matching query and filters, best match first, as
+    (total, [(paper_id, score)]). Scores are None where there is no ranking
+    (no FULLTEXT index, or a query of filters and short words only).
+    """
+    fulltext = uses_fulltext(db)
+    conditions = filters + search_filters(query, fulltext)
+    scores = relevance_scores(query) if fulltext else None
+
+    if scores is None:
+        base = select(Paper.paper_id, literal(None).label("score")).where(*conditions)
+        order = [Paper.added_on.is_(None), Paper.added_on.desc(), Paper.paper_id.desc()]
+    else:
+        base = (
+            select(Paper.paper_id, scores.c.score)
+            .join(scores, scores.c.paper_id == Paper.paper_id)
+            .where(*conditions)
+        )
+        order = [scores.c.score.desc(), Paper.paper_id.desc()]
+
+    total = db.scalar(select(func.count()).select_from(base.subquery()))
+    rows = db.execute(base.order_by(*order).limit(limit).offset(offset)).all()
+    return total, [(paper_id, float(score) if score is not None else None) for paper_id, score in rows]
+
+
+def ensure_search_indexes(engine):
+    """
+    Create the FULLTEXT indexes missing from a database created before they
+    existed. Only MySQL has them; elsewhere search falls back to LIKE.
+    """
+    if engine.dialect.name != "mysql":
+        return
+    inspector = inspect(engine)
+    for table, name in SEARCH_INDEXES:
+        if name in {index["name"] for index in inspector.get_indexes(table.name)}:
+            continue
+        index = next(index for index in table.indexes if index.name == name)
+        with engine.begin() as connection:
+            index.create(bind=connection)
+        print(f"Created FULLTEXT index {name} on {table.name}")
@@ -0,0 +1,114 @@
+"""
+Paper-level embeddings: one vector per paper, of its title and abstract.
+
+Chunk vectors (the main VectorStore) answer chat questions; these answer
+"papers like this one" and topic searches over the library. They live in a
+second VectorStore holding a single "chunk" per paper, so they get the same
+write-ahead log, snapshots, tombstoned deletes and index planning. A paper is
+embedded once when it is added, and a lookup is one search of a small index.
+"""
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+import threading
+import numpy as np
+
+from ..models import Paper
+
+# Papers embedded per model call when indexing in bulk
+PAPER_EMBED_BATCH = 64
+
+
+def paper_text(title: Optional[str], abstract: Optional[str]) -> str:
+    """The text a paper is embedded by."""
+    title = (title or "").strip()
+    abstract = (abstract or "").strip()
+    if title and abstract:
+        return f"{title}. {abstract}"
+    return title or abstract
+
+
+class PaperVectors:
+    def __init__(self, store, embed: Callable[[List[str]], np.ndarray]):
+        self.store = store
+        self.embed = embed
+        self._backfill_thread: Optional[threading.Thread] = None
+        # Makes each replace (delete + add) atomic, so concurrent upserts of
+        # one paper cannot leave it with two vectors
+        self._lock = threading.Lock()
+
+    def __contains__(self, paper_id) -> bool:
+        return self.store.has_paper(paper_id)
+
+    def upsert(self, papers: Sequence[Tuple[int, str]]) -> int:
+        """
+        (Re)index (paper_id, text) pairs, replacing any vector a paper already
+        has. Papers without text are skipped. Returns the number indexed.
+        """
+        papers = [(paper_id, text) for paper_id, text in papers if text]
+        for first in range(0, len(papers), PAPER_EMBED_BATCH):
+            batch = papers[first:first + PAPER_EMBED_BATCH]
+            embeddings = self.embed([text for _, text in batch])
+            with self._lock:
+                for (paper_id, text), embedding in zip(batch, embeddings):
+                    self.store.delete_paper(paper_id)
+                    self.store.add_paper(paper_id, [text], embedding[None, :])
+        if papers:
+            self.store.maintain()
+        return len(papers)
+
+    def remove(self, paper_id):
+        with self._lock:
+            removed = self.store.delete_paper(paper_id)
+        if removed:
+            self.store.maintain()
+
+    def vector(self, paper_id) -> Optional[np.ndarray]:
+        """A paper's stored embedding, shape (1, dimension), or None if it has none."""
+        vectors = self.store.embeddings_for([paper_id])
+        if len(vectors) == 0:
+            return None
+        return vectors[-1:]
+
+    def search(self, query_vector: np.ndarray, top_k: int,
+               paper_ids: Optional[Iterable] = None) -> List[Tuple[int, float]]:
+        """(paper_id, cosine similarity) of the top_k papers closest to query_vector."""
+        return [(int(hit["paper_id"]), hit["similarity_score"])
+                for hit in self.store.search(query_vector, top_k, paper_ids)]
+
+    def similar(self, paper_id, top_k: int,
+                paper_ids: Optional[Iterable] = None) -> Optional[List[Tuple[int, float]]]:
+        """
+        The top_k papers closest to a paper, itself excluded, or None when the
+        paper has no vector.
+        """
+        vector = self.vector(paper_id)
+        if vector is None:
+            return None
+        hits = self.search(vector, top_k + 1, paper_ids)
+        return [(other, score) for other, score in hits if other != int(paper_id)][:top_k]
+
+    def backfill(self, session_factory) -> int:
+        """Index every paper in the database that has no vector yet, e.g. papers added before this index existed."""
+        db = session_factory()
+        try:
+            missing = [(paper_id, paper_text(title, abstract))
+                       for paper_id, title, abstract in db.query(Paper.paper_id, Paper.title, Paper.abstract)
+                       if paper_id not in self]
+        finally:
+            db.close()
+        indexed = self.upsert(missing)
+        if indexed:
+            print(f"Indexed {indexed} papers missing a paper vector")
+        return indexed
+
+    def backfill_in_background(self, session_factory):
+        if self._backfill_thread is not None and self._backfill_thread.is_alive():
+            return
+
+        def run():
+            try:
+                self.backfill(session_factory)
+            except Exception as e:
+                print(f"Paper vector backfill failed: {e}")
+
+        self._backfill_thread = threading.Thread(target=run, name="paper-vector-backfill", daemon=True)
+        self._backfill_thread.start()
@@ -0,0 +1,240 @@
+"""
+PDF text extraction and chunking.
+
+Kept free of the app's heavier imports (model, database, vector store) so the
+functions can run in worker processes, see utils/worker_pool.py.
+
+Extraction streams: one page is read and cleaned at a time, split into
+sentences, and chunks are emitted as soon as they fill up. Only the sentences of
+the chunk being built (plus an unfinished sentence carried over to the next
+page) are held, never the whole document text. Every chunk records the pages it
+spans and its character offsets in the document's cleaned text (the cleaned
+pages joined by single spaces).
+
+Chunks are sized in tokens of the embedding model's tokenizer rather than in
+characters: the model only embeds its first max_seq_length tokens, so a chunk
+longer than that would be partly thrown away.
+"""
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Optional
+from bisect import bisect_right
+import os
+import re
+import fitz
+
+from .lazy import LazyResource
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+# An unfinished sentence longer than this is not carried to the next page but
+# treated as complete, so text without punctuation cannot pile up
+MAX_CARRY_CHARS = 10000
+
+# A sentence: (text, char_start, char_end) in the document's cleaned text
+Sentence = Tuple[str, int, int]
+
+# Tokenizer of the embedding model (all-mpnet-base-v2 in main.py)
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "sentence-transformers/all-mpnet-base-v2")
+# The model embeds at most 384 tokens, two of which are the <s> and </s> markers
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 382))
+# Tokens of trailing sentences repeated at the start of the next chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 64))
+# Sentences tokenized per tokenizer call
+TOKENIZE_BATCH = 256
+
+
+def load_chunk_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(CHUNK_TOKENIZER)
+
+# Loaded once per process (worker processes included) on first use
+chunk_tokenizer = LazyResource("chunk tokenizer", load_chunk_tokenizer)
+
+
+def clean_text(text: str) -> str:
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\n\d+\n', ' ', text)
+    return text.strip()
+
+def split_sentences(text: str, offset: int = 0) -> Iterator[Sentence]:
+    """Split by punctuation + whitespace, yielding each sentence with its span."""
+    start = 0
+    for boundary in SENTENCE_BOUNDARY.finditer(text):
+        if boundary.start() > start:
+            yield text[start:boundary.start()], offset + start, offset + boundary.start()
+        start = boundary.end()
+    if start < len(text):
+        yield text[start:], offset + start, offset + len(text)
+
+def chunk_sentences(sentences: Iterable[Sentence], chunk_size=4000, overlap_sentences=6) -> Iterator[Dict[str, Any]]:
+    """
+    Group sentences into chunks of about chunk_size characters, repeating the
+    last overlap_sentences sentences of a chunk at the start of the next one.
+    Yields {"text", "char_start", "char_end"} as soon as each chunk is complete.
+    """
+    current_chunk: List[Sentence] = []
+    current_length = 0
+
+    def emit():
+        return {
+            "text": " ".join(s[0] for s in current_chunk).strip(),
+            "char_start": current_chunk[0][1],
+            "char_end": current_chunk[-1][2]
+        }
+
+    for sentence in sentences:
+        sentence_len = len(sentence[0])
+
+        if current_length + sentence_len > chunk_size and current_chunk:
+            yield emit()
+
+            # Overlap: keep last N sentences for next chunk, always dropping at
+            # least one so consecutive chunks make progress
+            keep = min(overlap_sentences, len(current_chunk) - 1)
+            current_chunk = current_chunk[len(current_chunk) - keep:]
+            current_length = sum(len(s[0]) + 1 for s in current_chunk)
+
+        current_chunk.append(sentence)
+        current_length += sentence_len + 1  # +1 for space
+
+    # Add last chunk if any sentences remain
+    if current_chunk:
+        yield emit()
+
+def count_tokens(texts: List[str], tokenizer=None) -> List[int]:
+    tokenizer = tokenizer or chunk_tokenizer.get()
+    if not texts:
+        return []
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+def split_long_sentence(sentence: Sentence, tokenizer, max_tokens: int) -> Iterator[Tuple[Sentence, int]]:
+    """Cut a sentence of more than max_tokens tokens at token boundaries, using the tokenizer's offsets."""
+    text, start, _ = sentence
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    for first in range(0, len(offsets), max_tokens):
+        window = offsets[first:first + max_tokens]
+        piece_start, piece_end = window[0][0], window[-1][1]
+        yield (text[piece_start:piece_end], start + piece_start, start + piece_end), len(window)
+
+def with_token_counts(sentences: Iterable[Sentence], tokenizer, max_tokens: int) -> Iterator[Tuple[Sentence, int]]:
+    """Pair sentences with their token counts, tokenizing TOKENIZE_BATCH at a time."""
+    batch: List[Sentence] = []
+
+    def flush():
+        for sentence, count in zip(batch, count_tokens([s[0] for s in batch], tokenizer)):
+            if count > max_tokens:
+                yield from split_long_sentence(sentence, tokenizer, max_tokens)
+            elif count:
+                yield sentence, count
+
+    for sentence in sentences:
+        batch.append(sentence)
+        if len(batch) >= TOKENIZE_BATCH:
+            yield from flush()
+            batch = []
+    yield from flush()
+
+def chunk_sentences_by_tokens(sentences: Iterable[Sentence], max_tokens: int = CHUNK_MAX_TOKENS,
+                              overlap_tokens: int = CHUNK_OVERLAP_TOKENS, tokenizer=None) -> Iterator[Dict[str, Any]]:
+    """
+    Group sentences into chunks of at most max_tokens tokens, repeating up to
+    overlap_tokens tokens of trailing sentences at the start of the next one.
+    Sentences longer than the budget are cut at token boundaries. Yields
+    {"text", "char_start", "char_end", "tokens"} as soon as each chunk is complete.
+    """
+    tokenizer = tokenizer or chunk_tokenizer.get()
+    current_chunk: List[Tuple[Sentence, int]] = []
+    current_tokens = 0
+
+    def emit():
+        return {
+            "text": " ".join(s[0] for s, _ in current_chunk).strip(),
+            "char_start": current_chunk[0][0][1],
+            "char_end": current_chunk[-1][0][2],
+            "tokens": current_tokens
+        }
+
+    for sentence, count in with_token_counts(sentences, tokenizer, max_tokens):
+        if current_chunk and current_tokens + count > max_tokens:
+            yield emit()
+
+            # Overlap: trailing sentences worth at most overlap_tokens that still
+            # leave room for this sentence, never the whole chunk
+            kept = 0
+            first_kept = len(current_chunk)
+            while first_kept > 1:
+                previous = current_chunk[first_kept - 1][1]
+                if kept + previous > overlap_tokens or kept + previous + count > max_tokens:
+                    break
+                kept += previous
+                first_kept -= 1
+            current_chunk = current_chunk[first_kept:]
+            current_tokens = kept
+
+        current_chunk.append((sentence, count))
+        current_tokens += count
+
+    if current_chunk:
+        yield emit()
+
+def chunk_text_paragraphwise(text: str, chunk_size=4000, overlap_sentences=6) -> List[str]:
+    return [chunk["text"] for chunk in chunk_sentences(split_sentences(text.strip()), chunk_size, overlap_sentences)]
+
+def iter_pdf_sentences(doc, page_starts: List[int], page_numbers: List[int]) -> Iterator[Sentence]:
+    """
+    Yield the sentences of every non-empty page in reading order. A sentence
+    that runs over a page break is completed with the next page's text before
+    it is yielded. The start offset and number of every page read are appended
+    to page_starts / page_numbers for mapping offsets back to pages.
+    """
+    carry = ""          # unfinished last sentence of the previous page
+    carry_start = 0
+    offset = 0          # length of the cleaned text so far
+
+    for page_number, page in enumerate(doc, start=1):
+        page_text = page.get_text()
+        if len(page_text.strip()) <= 50:  # Skip mostly empty pages
+            continue
+        page_text = clean_text(page_text)
+        page_starts.append(offset)
+        page_numbers.append(page_number)
+
+        text = (carry + " " + page_text) if carry else page_text
+        text_start = carry_start if carry else offset
+        offset += len(page_text) + 1
+
+        sentences = list(split_sentences(text, text_start))
+        carry, carry_start = "", 0
+        if sentences and not re.search(r'[.!?]$', sentences[-1][0]) and len(sentences[-1][0]) <= MAX_CARRY_CHARS:
+            carry, carry_start = sentences[-1][0], sentences[-1][1]
+            sentences.pop()
+        yield from sentences
+
+    if carry:
+        yield carry, carry_start, carry_start + len(carry)
+
+def iter_chunks_from_pdf(pdf_path: str, max_tokens: int = CHUNK_MAX_TOKENS,
+                         overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a PDF's chunks with their provenance:
+    {"text", "page_start", "page_end", "char_start", "char_end", "tokens"}, pages
+    1-based and inclusive, character offsets into the cleaned document text.
+    """
+    page_starts: List[int] = []
+    page_numbers: List[int] = []
+
+    def page_at(char_offset: int) -> int:
+        return page_numbers[bisect_right(page_starts, char_offset) - 1]
+
+    doc = fitz.open(pdf_path)
+    try:
+        for chunk in chunk_sentences_by_tokens(iter_pdf_sentences(doc, page_starts, page_numbers),
+                                               max_tokens, overlap_tokens):
+            if len(chunk["text"]) <= 100:
+                continue
+            chunk["page_start"] = page_at(chunk["char_start"])
+            chunk["page_end"] = page_at(chunk["char_end"] - 1)
+            yield chunk
+    finally:
+        doc.close()
+
+def extract_chunks_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
+    return list(iter_chunks_from_pdf(pdf_path))
@@ -0,0 +1,130 @@
+from typing import Callable, List, Dict, Any, Optional
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import time
+import numpy as np
+
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", 32))
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", 5))
+
+TIMING_WINDOW = 1000
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class QueryEmbeddingBatcher:
+    """
+    Micro-batches query embeddings across concurrent requests.
+
+    embed() queues a query and awaits its vector. A single background task takes
+    the first waiting query, collects whatever else arrives within max_wait_ms
+    (up to max_batch queries), encodes them with one model call on a dedicated
+    thread and resolves every caller's future. Queries that arrive while a batch
+    is encoding form the next batch, so under load batches grow on their own
+    and under light load a lone query waits at most max_wait_ms.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 max_batch: int = QUERY_BATCH_MAX, max_wait_ms: float = QUERY_BATCH_WAIT_MS):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="query-encode")
+
+        self._batches = 0
+        self._queries = 0
+        self._max_queue_depth = 0
+        self._batch_sizes = Counter()
+        self._wait_seconds = deque(maxlen=TIMING_WINDOW)
+        self._encode_seconds = deque(maxlen=TIMING_WINDOW)
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Return the (1, dimension) float32 embedding of `text`."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(self._executor, self.encode, [text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            self._record(batch, started, finished)
+            for row, (_, future, _) in enumerate(batch):
+                if not future.done():
+                    future.set_result(vectors[row:row + 1].astype('float32'))
+
+    def _record(self, batch, started: float, finished: float):
+        self._batches += 1
+        self._queries += len(batch)
+        self._batch_sizes[next((b for b in BATCH_SIZE_BUCKETS if len(batch) <= b), BATCH_SIZE_BUCKETS[-1])] += 1
+        self._encode_seconds.append(finished - started)
+        self._wait_seconds.extend(started - queued for _, _, queued in batch)
+
+    def stats(self) -> Dict[str, Any]:
+        def percentiles(samples):
+            if not samples:
+                return {"p50_ms": None, "p95_ms": None}
+            return {"p50_ms": round(float(np.percentile(samples, 50)) * 1000, 2),
+                    "p95_ms": round(float(np.percentile(samples, 95)) * 1000, 2)}
+
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self._max_queue_depth,
+            "batches": self._batches,
+            "queries": self._queries,
+            "mean_batch_size": round(self._queries / self._batches, 2) if self._batches else None,
+            "batch_sizes": {f"<={bucket}": self._batch_sizes[bucket]
+                            for bucket in BATCH_SIZE_BUCKETS if self._batch_sizes[bucket]},
+            "wait": percentiles(list(self._wait_seconds)),
+            "encode": percentiles(list(self._encode_seconds)),
+        }
+
+    async def aclose(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,153 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+import json
+import os
+import re
+import threading
+
+TEI_CACHE_DIR = os.getenv("TEI_CACHE_DIR", "tei_cache")
+TEI_CACHE_MAX_MB = float(os.getenv("TEI_CACHE_MAX_MB", 512))
+
+TEI_SUFFIX = ".tei.xml"
+RESULT_SUFFIX = ".json"
+PDF_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class TeiCache:
+    """
+    On-disk cache of GROBID output keyed by the PDF's SHA-256.
+
+    Each entry is the TEI document (<hash>.tei.xml) plus, once /extract has
+    finished with it, the parsed metadata including any LLM-extracted keywords
+    (<hash>.json). Entries are evicted least recently used first once the
+    directory grows past max_bytes; file mtimes carry the recency across
+    restarts.
+    """
+
+    def __init__(self, directory: str = TEI_CACHE_DIR, max_bytes: int = int(TEI_CACHE_MAX_MB * 1024 * 1024)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: Optional[OrderedDict] = None  # pdf_hash -> bytes on disk, oldest first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, pdf_hash: str, suffix: str) -> str:
+        if not PDF_HASH_PATTERN.match(pdf_hash):
+            raise ValueError(f"Not a SHA-256 hex digest: {pdf_hash!r}")
+        return os.path.join(self.directory, pdf_hash + suffix)
+
+    def _entry_size(self, pdf_hash: str) -> int:
+        size = 0
+        for suffix in (TEI_SUFFIX, RESULT_SUFFIX):
+            try:
+                size += os.path.getsize(self._path(pdf_hash, suffix))
+            except OSError:
+                pass
+        return size
+
+    def _entries(self) -> OrderedDict:
+        if self._sizes is None:
+            os.makedirs(self.directory, exist_ok=True)
+            found = []
+            for name in os.listdir(self.directory):
+                if name.endswith(TEI_SUFFIX) and PDF_HASH_PATTERN.match(name[:-len(TEI_SUFFIX)]):
+                    found.append((os.path.getmtime(os.path.join(self.directory, name)), name[:-len(TEI_SUFFIX)]))
+            self._sizes = OrderedDict((pdf_hash, self._entry_size(pdf_hash)) for _, pdf_hash in sorted(found))
+        return self._sizes
+
+    def _touch(self, pdf_hash: str):
+        self._entries().move_to_end(pdf_hash)
+        try:
+            os.utime(self._path(pdf_hash, TEI_SUFFIX))
+        except OSError:
+            pass
+
+    def _write(self, path: str, data: bytes):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(entries.values())
+        while entries and total > self.max_bytes:
+            pdf_hash, size = entries.popitem(last=False)
+            total -= size
+            for suffix in (TEI_SUFFIX, RESULT_SUFFIX):
+                try:
+                    os.remove(self._path(pdf_hash, suffix))
+                except FileNotFoundError:
+                    pass
+            self.evictions += 1
+
+    def tei_path(self, pdf_hash: str) -> Optional[str]:
+        """Path of the cached TEI file, or None when it is not cached."""
+        with self._lock:
+            if pdf_hash not in self._entries():
+                return None
+            return self._path(pdf_hash, TEI_SUFFIX)
+
+    def get_tei(self, pdf_hash: str) -> Optional[bytes]:
+        with self._lock:
+            if pdf_hash not in self._entries():
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(pdf_hash, TEI_SUFFIX), "rb") as f:
+                    tei = f.read()
+            except FileNotFoundError:
+                # Removed behind our back
+                self._entries().pop(pdf_hash, None)
+                self.misses += 1
+                return None
+            self._touch(pdf_hash)
+            self.hits += 1
+            return tei
+
+    def get_result(self, pdf_hash: str) -> Optional[Dict[str, Any]]:
+        """Parsed metadata stored by put_result, if any. A miss here is left for get_tei to count."""
+        with self._lock:
+            if pdf_hash not in self._entries():
+                return None
+            try:
+                with open(self._path(pdf_hash, RESULT_SUFFIX), "r", encoding="utf-8") as f:
+                    result = json.load(f)
+            except (FileNotFoundError, ValueError):
+                return None
+            self._touch(pdf_hash)
+            self.hits += 1
+            return result
+
+    def put_tei(self, pdf_hash: str, tei: bytes):
+        with self._lock:
+            entries = self._entries()
+            self._write(self._path(pdf_hash, TEI_SUFFIX), tei)
+            entries[pdf_hash] = self._entry_size(pdf_hash)
+            entries.move_to_end(pdf_hash)
+            self._evict()
+
+    def put_result(self, pdf_hash: str, result: Dict[str, Any]):
+        with self._lock:
+            entries = self._entries()
+            if pdf_hash not in entries:
+                return  # the TEI was evicted in the meantime
+            self._write(self._path(pdf_hash, RESULT_SUFFIX), json.dumps(result, default=str).encode("utf-8"))
+            entries[pdf_hash] = self._entry_size(pdf_hash)
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._entries()
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(entries),
+                "bytes": sum(entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
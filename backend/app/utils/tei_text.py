@@ -0,0 +1,198 @@
+"""
+Metadata and section-aware chunks from GROBID's TEI XML.
+
+Both parsers stream the document with iterparse and clear every element once
+it has been read, so memory does not grow with the size of the TEI. Like
+utils/pdf_text.py this module stays free of the app's heavier imports so it can
+run in worker processes.
+
+Chunks come from the <body> only: each section (<div>) is chunked on its own,
+so no chunk straddles two sections, and the section heading is prefixed to the
+chunk text. <back> (references, acknowledgements, annexes), figures, formulas
+and footnotes are left out. Pages come from the sentence coordinates GROBID
+adds when asked for them (see GROBID_FULLTEXT_OPTIONS in utils/grobid_client.py);
+character offsets are into the body text, i.e. all body sentences joined by
+single spaces.
+"""
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+from bisect import bisect_right
+import io
+import re
+import xml.etree.ElementTree as ET
+
+from .pdf_text import chunk_sentences_by_tokens, count_tokens, split_sentences, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+TEI_NS = "{http://www.tei-c.org/ns/1.0}"
+
+# Body elements whose text is not part of the running text
+SKIPPED_BODY_ELEMENTS = {TEI_NS + name for name in ("figure", "formula", "note", "table")}
+
+
+def _source(tei: Union[bytes, str]):
+    """iterparse accepts a path or a file object; TEI held in memory is wrapped."""
+    return io.BytesIO(tei) if isinstance(tei, bytes) else tei
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip()
+
+def element_text(el) -> str:
+    """Text of an element, keeping GROBID's <s> sentence elements apart."""
+    sentences = el.findall(f".//{TEI_NS}s")
+    if sentences:
+        return " ".join(_normalize("".join(s.itertext())) for s in sentences)
+    return _normalize("".join(el.itertext()))
+
+def coords_page(el) -> Optional[int]:
+    """First page of a GROBID coords attribute ("page,x,y,w,h;..."), if present."""
+    coords = el.get("coords")
+    if not coords:
+        return None
+    try:
+        return int(coords.split(",", 1)[0])
+    except ValueError:
+        return None
+
+def parse_tei(tei: Union[bytes, str]):
+    """Title, abstract, keywords, authors and publication date from the TEI header."""
+    title = None
+    abstract = None
+    keywords = []
+    authors = []
+    pub_date = None
+    path: List[str] = []
+
+    for event, el in ET.iterparse(_source(tei), events=("start", "end")):
+        if event == "start":
+            path.append(el.tag)
+            continue
+        path.pop()
+        tag = el.tag
+        if tag == TEI_NS + "title" and title is None and TEI_NS + "titleStmt" in path:
+            title = el.text
+        elif tag == TEI_NS + "abstract" and abstract is None and TEI_NS + "profileDesc" in path:
+            abstract = element_text(el)
+            el.clear()
+        elif tag == TEI_NS + "term" and TEI_NS + "keywords" in path and TEI_NS + "profileDesc" in path:
+            if el.text:
+                keywords.append(el.text.strip())
+        elif tag == TEI_NS + "author" and TEI_NS + "sourceDesc" in path:
+            name_el = el.find(TEI_NS + "persName")
+            forenames = name_el.findall(TEI_NS + "forename") if name_el is not None else []
+            surname_el = name_el.find(TEI_NS + "surname") if name_el is not None else None
+
+            full_name = " ".join([fn.text for fn in forenames if fn.text]) + (
+                " " + surname_el.text if surname_el is not None and surname_el.text else ""
+            )
+            authors.append({
+                "name": full_name.strip()
+            })
+            el.clear()
+        elif tag == TEI_NS + "date" and pub_date is None and TEI_NS + "sourceDesc" in path:
+            pub_date = el.get("when")
+        elif tag == TEI_NS + "teiHeader":
+            # Everything needed is in the header; the body is not read at all
+            break
+
+    return {
+        "title": title,
+        "abstract": abstract,
+        "keywords": keywords,
+        "authors": authors,
+        "publication_date": pub_date
+    }
+
+def iter_tei_sections(tei: Union[bytes, str]) -> Iterator[Tuple[Optional[str], List[Tuple[str, Optional[int]]]]]:
+    """
+    Yield (heading, sentences) for every section of the TEI body, sentences as
+    (text, page) with page None when the TEI carries no coordinates.
+    """
+    path: List[str] = []
+    heading: Optional[str] = None
+    sentences: List[Tuple[str, Optional[int]]] = []
+
+    for event, el in ET.iterparse(_source(tei), events=("start", "end")):
+        if event == "start":
+            path.append(el.tag)
+            if el.tag == TEI_NS + "div" and TEI_NS + "body" in path:
+                if sentences:
+                    yield heading, sentences  # text directly under <body>
+                heading, sentences = None, []
+            continue
+        path.pop()
+        tag = el.tag
+        if TEI_NS + "body" not in path and tag != TEI_NS + "body":
+            if tag == TEI_NS + "teiHeader":
+                el.clear()
+            continue
+        if any(skipped in path for skipped in SKIPPED_BODY_ELEMENTS):
+            continue  # cleared with the enclosing figure/formula/note
+
+        if tag in SKIPPED_BODY_ELEMENTS:
+            el.clear()
+        elif tag == TEI_NS + "head" and path and path[-1] == TEI_NS + "div":
+            heading = element_text(el) or None
+            el.clear()
+        elif tag == TEI_NS + "p":
+            s_elements = el.findall(f".//{TEI_NS}s")
+            if s_elements:
+                page = coords_page(el)
+                for s in s_elements:
+                    text = _normalize("".join(s.itertext()))
+                    page = coords_page(s) or page
+                    if text:
+                        sentences.append((text, page))
+            else:
+                page = coords_page(el)
+                sentences.extend((text, page) for text, _, _ in split_sentences(element_text(el)))
+            el.clear()
+        elif tag == TEI_NS + "div":
+            if sentences:
+                yield heading, sentences
+            heading, sentences = None, []
+            el.clear()
+        elif tag == TEI_NS + "body":
+            if sentences:
+                yield heading, sentences
+            break
+
+def iter_chunks_from_tei(tei: Union[bytes, str], max_tokens: int = CHUNK_MAX_TOKENS,
+                         overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Dict[str, Any]]:
+    """
+    Stream chunk records in the format of utils/pdf_text.py,
+    {"text", "page_start", "page_end", "char_start", "char_end", "tokens"}, from
+    the TEI body. Pages are -1 when the TEI has no coordinates. The heading
+    prefix counts against the token budget.
+    """
+    offset = 0
+    for heading, sentences in iter_tei_sections(tei):
+        # Sentence start offsets and pages; chunks may start or end inside a
+        # sentence that was cut for being over the token budget
+        starts: List[int] = []
+        pages: List[Optional[int]] = []
+        spans = []
+        for text, page in sentences:
+            spans.append((text, offset, offset + len(text)))
+            starts.append(offset)
+            pages.append(page)
+            offset += len(text) + 1
+
+        def page_at(char_offset: int) -> Optional[int]:
+            return pages[bisect_right(starts, char_offset) - 1]
+
+        prefix = f"{heading}: " if heading else ""
+        prefix_tokens = count_tokens([prefix])[0] if prefix else 0
+        if prefix_tokens > max_tokens // 4:
+            prefix, prefix_tokens = "", 0  # a "heading" that is really a paragraph
+
+        for chunk in chunk_sentences_by_tokens(spans, max_tokens - prefix_tokens, overlap_tokens):
+            chunk["text"] = prefix + chunk["text"]
+            chunk["tokens"] += prefix_tokens
+            page_start = page_at(chunk["char_start"])
+            page_end = page_at(chunk["char_end"] - 1)
+            chunk["page_start"] = page_start if page_start is not None else -1
+            chunk["page_end"] = page_end if page_end is not None else chunk["page_start"]
+            yield chunk
+
+def extract_chunks_from_tei(tei: Union[bytes, str]) -> List[Dict[str, Any]]:
+    """Chunks of a TEI document given as bytes or as the path of a TEI file."""
+    return list(iter_chunks_from_tei(tei))
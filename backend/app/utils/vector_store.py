@@ -0,0 +1,528 @@
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+from contextlib import contextmanager
+import json
+import os
+import pickle
+import shutil
+import threading
+import numpy as np
+import faiss
+
+from .vector_wal import WriteAheadLog, fsync_dir
+from .chunk_store import ChunkStore
+from .paper_index import PaperIndex, PAPER_INDEX_NAME
+from .index_factory import build_index, configure_index, index_kind, plan_index, search_parameters, training_size
+
+# Filtered searches over at most this many vectors are scored exactly against the
+# reconstructed subset; larger subsets go through a FAISS ID selector instead.
+EXACT_SEARCH_LIMIT = 20000
+
+# Fold the write-ahead log into a new snapshot once it grows past this size.
+COMPACT_WAL_BYTES = int(os.getenv("VECTOR_COMPACT_WAL_BYTES", 64 * 1024 * 1024))
+
+MANIFEST_NAME = "MANIFEST"
+
+# Upper bound on the number of vectors sampled to train IVF quantizers
+MAX_TRAINING_VECTORS = 256 * 1024
+
+# Physically drop deleted vectors once they make up this fraction of the index.
+PURGE_DEAD_RATIO = float(os.getenv("VECTOR_PURGE_DEAD_RATIO", 0.1))
+
+TOMBSTONES_NAME = "tombstones.npy"
+
+
+def _fsync_file(path: str):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+class ReadWriteLock:
+    """
+    Many readers or one writer. A waiting writer holds off new readers, so a
+    steady stream of searches cannot starve an ingest. Not reentrant.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class VectorStore:
+    """
+    FAISS index plus chunk texts, persisted as a snapshot and a write-ahead log.
+
+    On disk, `directory` holds a MANIFEST naming the current generation's snapshot
+    directory and WAL file. Ingests only append to the WAL; compaction writes a new
+    snapshot generation and atomically swaps the manifest, so a crash at any point
+    leaves either the old or the new generation fully intact.
+
+    Deleting a paper only tombstones its vector ids (a WAL record plus an entry in
+    `tombstones`); searches exclude them through an ID selector. Once dead vectors
+    pass PURGE_DEAD_RATIO a background compaction writes a generation without them.
+
+    FAISS indexes must not be searched while they are being added to, so two
+    locks guard the store: `_lock` serializes writers (ingest, delete,
+    maintenance), and `_state_lock` lets searches run together but never while
+    a writer changes the index, tombstones or chunks in memory. Maintenance
+    builds its new index under `_lock` only, so searches continue until the
+    short swap at the end.
+    """
+
+    def __init__(self, dimension: int, directory: Optional[str] = None, index_mode: str = "flat"):
+        self.dimension = dimension
+        self.directory = directory
+        self.index_mode = index_mode
+        self.index = build_index("flat", dimension)
+        self.chunks = ChunkStore(dimension)
+        self.papers = PaperIndex()
+        self.tombstones: Set[int] = set()
+        self._live_selector = None
+        self.next_vector_id = 0
+        self.generation = 0
+        # Bumped whenever search results may change (adds, deletes, index swaps);
+        # callers caching results key them by it.
+        self.version = 0
+        self.wal: Optional[WriteAheadLog] = None
+        self._lock = threading.RLock()
+        self._state_lock = ReadWriteLock()
+        self._maintenance_thread: Optional[threading.Thread] = None
+
+    @property
+    def ntotal(self) -> int:
+        """Number of live (not deleted) vectors."""
+        return self.index.ntotal - len(self.tombstones)
+
+    def dead_ratio(self) -> float:
+        return len(self.tombstones) / self.index.ntotal if self.index.ntotal else 0.0
+
+    def set_state(self, index, chunks: ChunkStore, next_vector_id: int,
+                  tombstones: Optional[Iterable[int]] = None, papers: Optional[PaperIndex] = None):
+        """
+        Install a loaded index and chunk store. Indexes saved before vector ids were
+        tracked explicitly are plain flat indexes whose ids are their positions,
+        so they are wrapped in an IndexIDMap2 with those same ids. Without a saved
+        paper index it is derived from the chunk store's paper id column.
+        """
+        if type(faiss.downcast_index(index)) is faiss.IndexFlatIP:
+            vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else None
+            index = build_index("flat", self.dimension)
+            if vectors is not None:
+                index.add_with_ids(vectors, np.arange(len(vectors), dtype='int64'))
+
+        if chunks.vectors is None:
+            # Snapshots written before raw embeddings were kept: the index was flat
+            # then, so its stored vectors are exact.
+            chunks.vectors = index.reconstruct_batch(np.asarray(chunks.vector_ids)) \
+                if len(chunks.vector_ids) else np.zeros((0, self.dimension), dtype='float32')
+
+        tombstones = set(tombstones or [])
+        if papers is None:
+            papers = PaperIndex.from_groups(chunks.paper_groups(exclude=tombstones))
+        with self._state_lock.write():
+            self.chunks.close()
+            self.index = configure_index(index)
+            self.chunks = chunks
+            self.next_vector_id = next_vector_id
+            self.tombstones = tombstones
+            self._live_selector = None
+            self.papers = papers
+
+    def set_legacy_state(self, index, metadata: Dict[int, Dict[str, Any]], next_vector_id: int):
+        """Install state from the pickled {vector_id: {"paper_id", "text"}} metadata format."""
+        self.set_state(index, ChunkStore(self.dimension), next_vector_id)
+        for vector_id, meta in sorted(metadata.items()):
+            vector = self.index.reconstruct(int(vector_id))
+            self.chunks.add([int(vector_id)], int(meta["paper_id"]), [meta.get("text", "")], [vector])
+        self.papers = PaperIndex.from_groups(self.chunks.paper_groups())
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def _snapshot_dir(self, generation: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{generation:06d}")
+
+    def _wal_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"wal-{generation:06d}.log")
+
+    def load(self) -> bool:
+        """
+        Recover the store from `directory`: load the snapshot named by the manifest
+        and replay the WAL on top of it. Returns False if no store exists yet.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if not os.path.exists(self._manifest_path()):
+                return False
+
+            with open(self._manifest_path(), "r") as f:
+                manifest = json.load(f)
+
+            generation = manifest["generation"]
+            snapshot_dir = self._snapshot_dir(generation)
+            index = faiss.read_index(os.path.join(snapshot_dir, "index.faiss"))
+            legacy_metadata_path = os.path.join(snapshot_dir, "metadata.pkl")
+            if os.path.exists(legacy_metadata_path):
+                with open(legacy_metadata_path, "rb") as f:
+                    self.set_legacy_state(index, pickle.load(f), manifest["next_vector_id"])
+                needs_compaction = True
+            else:
+                chunks = ChunkStore.open(snapshot_dir, self.dimension)
+                tombstones_path = os.path.join(snapshot_dir, TOMBSTONES_NAME)
+                tombstones = np.load(tombstones_path).tolist() if os.path.exists(tombstones_path) else []
+                has_paper_index = os.path.exists(os.path.join(snapshot_dir, PAPER_INDEX_NAME))
+                papers = PaperIndex.load(snapshot_dir) if has_paper_index else None
+                needs_compaction = chunks.vectors is None or not has_paper_index
+                self.set_state(index, chunks, manifest["next_vector_id"], tombstones, papers)
+            self.generation = generation
+
+            self.wal = WriteAheadLog(self._wal_path(generation))
+            replayed = 0
+            for record in self.wal.replay():
+                self._apply(record)
+                replayed += 1
+
+            if needs_compaction:
+                # Snapshots written in an older layout are converted once
+                self.compact()
+            self._remove_stale_generations()
+            self.maintain(background=False)
+            print(f"Loaded vector store generation {self.generation} with {self.ntotal} vectors "
+                  f"({replayed} WAL records replayed)")
+            return True
+
+    def _apply(self, record: Dict[str, Any]):
+        with self._state_lock.write():
+            self._apply_locked(record)
+
+    def _apply_locked(self, record: Dict[str, Any]):
+        if record["op"] == "add":
+            ids = record["ids"]
+            paper_id = int(record["paper_id"])
+            self.index.add_with_ids(record["vectors"], ids)
+            # Records logged before chunk provenance was kept have none
+            self.chunks.add(ids.tolist(), paper_id, record["texts"], record["vectors"], record.get("provenance"))
+            self.papers.add(paper_id, int(ids[0]), len(ids))
+            self.next_vector_id = max(self.next_vector_id, int(ids[-1]) + 1)
+        elif record["op"] == "delete":
+            self.tombstones.update(PaperIndex.expand(self.papers.pop(int(record["paper_id"]))))
+            self._live_selector = None
+        self.version += 1
+
+    def add_paper(self, paper_id, chunks: List[str], embeddings: np.ndarray,
+                  provenance: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Append a paper's chunk texts and embeddings. `provenance` is the chunks'
+        (n, 4) page range and character offsets, see chunk_store.provenance_array.
+        """
+        with self._lock:
+            ids = np.arange(self.next_vector_id, self.next_vector_id + len(chunks), dtype='int64')
+            record = {
+                "op": "add",
+                "paper_id": int(paper_id),
+                "ids": ids,
+                "vectors": np.ascontiguousarray(embeddings, dtype='float32'),
+                "texts": list(chunks),
+                "provenance": None if provenance is None else np.asarray(provenance, dtype='int64')
+            }
+            self._log(record)
+            self._apply(record)
+            return ids.tolist()
+
+    def _log(self, record: Dict[str, Any]):
+        if self.wal is not None:
+            self.wal.append(record)
+        elif self.directory is not None:
+            # A persistent store must be load()ed or compact()ed first; applying
+            # the change unlogged would silently lose it on restart
+            raise RuntimeError("Vector store has no write-ahead log open; it was not loaded")
+
+    def delete_paper(self, paper_id) -> int:
+        """Tombstone every vector of a paper. Returns the number of vectors deleted."""
+        with self._lock:
+            count = self.papers.count(int(paper_id))
+            if count == 0:
+                return 0
+            record = {"op": "delete", "paper_id": int(paper_id)}
+            self._log(record)
+            self._apply(record)
+            return count
+
+    def maintain(self, background: bool = True):
+        """
+        Rebuild the index when the configured mode calls for a different kind at the
+        current corpus size, purge deleted vectors once they pass PURGE_DEAD_RATIO,
+        and fold the WAL into a snapshot once it is large. With background=True the
+        work runs on a maintenance thread; searches keep using the current index
+        and snapshot until the new ones are swapped in.
+        """
+        with self._lock:
+            plan = plan_index(self.index_mode, self.ntotal, self.index)
+            rebuild = plan != index_kind(self.index)
+            purge = self.dead_ratio() > PURGE_DEAD_RATIO
+            wal_full = self.wal is not None and self.wal.size() > COMPACT_WAL_BYTES
+            if not (rebuild or purge or wal_full):
+                return
+            if background:
+                if self._maintenance_thread is not None and self._maintenance_thread.is_alive():
+                    return
+                self._maintenance_thread = threading.Thread(
+                    target=self._run_maintenance, args=(plan if rebuild else None, purge), daemon=True
+                )
+                self._maintenance_thread.start()
+                return
+        self._run_maintenance(plan if rebuild else None, purge)
+
+    def _run_maintenance(self, plan, purge: bool):
+        try:
+            with self._lock:
+                index = self.build_live_index(*plan) if plan is not None else None
+                self.compact(purge=purge, index=index)
+        except Exception as e:
+            print(f"Vector store maintenance failed: {e}")
+
+    def build_live_index(self, mode: str, nlist: int = 0):
+        """Build a fresh index of the given kind from the raw embeddings of all live vectors."""
+        with self._lock:
+            training = None
+            if training_size(mode, nlist):
+                training = self.chunks.sample_vectors(min(training_size(mode, nlist), MAX_TRAINING_VECTORS))
+
+            index = build_index(mode, self.dimension, nlist, training)
+            dead = np.fromiter(self.tombstones, dtype='int64', count=len(self.tombstones))
+            for ids, vectors in self.chunks.iter_vectors():
+                live = ~np.isin(ids, dead)
+                if live.any():
+                    index.add_with_ids(np.ascontiguousarray(vectors[live]), ids[live])
+
+            print(f"Built {mode} vector index (nlist={nlist}) over {index.ntotal} vectors")
+            return index
+
+    def _index_without(self, dead: np.ndarray):
+        """A copy of the current index with the given ids physically removed."""
+        mode, nlist = index_kind(self.index)
+        if mode == "hnsw":
+            # HNSW graphs do not support removal; rebuild from the raw embeddings
+            return self.build_live_index(mode, nlist)
+        index = faiss.clone_index(self.index)
+        index.remove_ids(faiss.IDSelectorBatch(dead))
+        return configure_index(index)
+
+    def compact(self, purge: bool = False, index=None):
+        """
+        Write the in-memory state as snapshot generation N+1 with an empty WAL,
+        then atomically point the manifest at it and drop generation N. With
+        purge=True tombstoned vectors are left out of the new generation. A freshly
+        built `index` (from build_live_index) replaces the current one and implies
+        purge, since it already holds only live vectors.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            generation = self.generation + 1
+            snapshot_dir = self._snapshot_dir(generation)
+            if os.path.exists(snapshot_dir):
+                shutil.rmtree(snapshot_dir)
+            os.makedirs(snapshot_dir)
+
+            dead = np.array(sorted(self.tombstones), dtype='int64')
+            if index is None:
+                if purge and len(dead):
+                    index = self._index_without(dead)
+                else:
+                    index = self.index
+                    dead = np.zeros(0, dtype='int64')
+
+            index_path = os.path.join(snapshot_dir, "index.faiss")
+            faiss.write_index(index, index_path)
+            _fsync_file(index_path)
+
+            self.chunks.write(snapshot_dir, exclude=dead)
+            self.papers.save(snapshot_dir)
+            remaining = np.array(sorted(self.tombstones - set(dead.tolist())), dtype='int64')
+            with open(os.path.join(snapshot_dir, TOMBSTONES_NAME), "wb") as f:
+                np.save(f, remaining)
+                f.flush()
+                os.fsync(f.fileno())
+            fsync_dir(snapshot_dir)
+
+            wal_path = self._wal_path(generation)
+            open(wal_path, "wb").close()
+            _fsync_file(wal_path)
+
+            manifest_tmp = self._manifest_path() + ".tmp"
+            with open(manifest_tmp, "w") as f:
+                json.dump({
+                    "generation": generation,
+                    "next_vector_id": self.next_vector_id
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(manifest_tmp, self._manifest_path())
+            fsync_dir(self.directory)
+
+            if self.wal is not None:
+                self.wal.close()
+            self.wal = WriteAheadLog(wal_path)
+            self.generation = generation
+            chunks = ChunkStore.open(snapshot_dir, self.dimension)
+            with self._state_lock.write():
+                self.index = index
+                self.chunks = chunks
+                self.tombstones = set(remaining.tolist())
+                self._live_selector = None
+                self.version += 1
+            self._remove_stale_generations()
+            print(f"Compacted vector store into generation {generation}"
+                  f"{f', purged {len(dead)} deleted vectors' if len(dead) else ''}")
+
+    def _remove_stale_generations(self):
+        keep = {os.path.basename(self._snapshot_dir(self.generation)),
+                os.path.basename(self._wal_path(self.generation)),
+                MANIFEST_NAME}
+        for name in os.listdir(self.directory):
+            if name in keep or not (name.startswith("snapshot-") or name.startswith("wal-")
+                                    or name == MANIFEST_NAME + ".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    def has_paper(self, paper_id) -> bool:
+        return int(paper_id) in self.papers
+
+    def vector_ids_for(self, paper_ids: Iterable) -> np.ndarray:
+        return self.papers.vector_ids(int(p) for p in paper_ids)
+
+    def embeddings_for(self, paper_ids: Iterable) -> np.ndarray:
+        """Stored raw embeddings of every chunk of the given papers, in vector id order."""
+        with self._state_lock.read():
+            return self.chunks.vectors_for(self.vector_ids_for(paper_ids))
+
+    def paper_stats(self, paper_id) -> Optional[Dict[str, Any]]:
+        with self._state_lock.read():
+            runs = self.papers.runs.get(int(paper_id))
+            if runs is None:
+                return None
+            return {
+                "paper_id": str(paper_id),
+                "chunks": sum(count for _, count in runs),
+                "vector_id_ranges": [[start, start + count] for start, count in runs],
+                "text_bytes": sum(self.chunks.text_bytes(start, start + count) for start, count in runs)
+            }
+
+    def search(self, query_vector: np.ndarray, top_k: int = 5,
+               paper_ids: Optional[Iterable] = None) -> List[Dict[str, Any]]:
+        """
+        Return the top_k chunks most similar to query_vector (shape (1, dimension)).
+        When paper_ids is given only chunks of those papers are considered, and the
+        cost of the search grows with the number of chunks they own rather than
+        with the size of the whole index.
+        """
+        return self.results_for(*self.search_ids(query_vector, top_k, paper_ids))
+
+    def search_ids(self, query_vector: np.ndarray, top_k: int = 5,
+                   paper_ids: Optional[Iterable] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Like search(), but return the (scores, vector ids) arrays of the hits."""
+        with self._state_lock.read():
+            return self._search_ids(query_vector, top_k, paper_ids)
+
+    def _search_ids(self, query_vector: np.ndarray, top_k: int, paper_ids: Optional[Iterable]):
+        empty = (np.zeros(0, dtype='float32'), np.zeros(0, dtype='int64'))
+        if self.ntotal == 0 or top_k <= 0:
+            return empty
+
+        if paper_ids is None:
+            index = self.index
+            k = min(top_k, self.ntotal)
+            if self.tombstones:
+                distances, indices = index.search(query_vector, k, params=self._live_params(index))
+            else:
+                distances, indices = index.search(query_vector, k)
+            return distances[0], indices[0]
+
+        candidate_ids = self.vector_ids_for(paper_ids)
+        if len(candidate_ids) == 0:
+            return empty
+
+        k = min(top_k, len(candidate_ids))
+        if len(candidate_ids) <= EXACT_SEARCH_LIMIT:
+            vectors = self.chunks.vectors_for(candidate_ids)
+            scores = vectors @ query_vector[0]
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return scores[top], candidate_ids[top]
+
+        params = search_parameters(self.index, faiss.IDSelectorBatch(candidate_ids))
+        distances, indices = self.index.search(query_vector, k, params=params)
+        return distances[0], indices[0]
+
+    def _live_params(self, index):
+        selector = self._live_selector
+        if selector is None:
+            dead = np.array(sorted(self.tombstones), dtype='int64')
+            batch = faiss.IDSelectorBatch(dead)
+            selector = faiss.IDSelectorNot(batch)
+            selector.referenced_batch = batch
+            self._live_selector = selector
+        return search_parameters(index, selector)
+
+    def results_for(self, distances, indices) -> List[Dict[str, Any]]:
+        """
+        Chunk text, paper id, page range, character offsets and score for each hit
+        of search_ids(); -1 and missing ids are skipped.
+        """
+        with self._state_lock.read():
+            return self._results_for(distances, indices)
+
+    def _results_for(self, distances, indices) -> List[Dict[str, Any]]:
+        results = []
+        for distance, idx in zip(distances, indices):
+            if idx == -1:
+                continue
+
+            chunk = self.chunks.get(int(idx))
+            if chunk is None:
+                continue
+            results.append({
+                "vector_id": int(idx),
+                "text": chunk["text"],
+                "paper_id": str(chunk["paper_id"]),
+                "page_start": chunk["page_start"],
+                "page_end": chunk["page_end"],
+                "char_start": chunk["char_start"],
+                "char_end": chunk["char_end"],
+                "similarity_score": float(distance)
+            })
+        return results
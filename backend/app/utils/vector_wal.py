@@ -0,0 +1,71 @@
+from typing import Dict, Any, Iterator
+import os
+import pickle
+import struct
+import zlib
+
+# Every record is framed as <payload length><crc32 of payload><pickled payload>
+HEADER = struct.Struct("<II")
+
+
+def fsync_dir(path: str):
+    # Directory fsync makes renames durable on POSIX; Windows has no equivalent.
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """
+    Append-only record log. Each append is flushed and fsynced before it returns,
+    and a torn record at the tail (e.g. a crash mid-write) is detected by its
+    length/checksum on replay and truncated away.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return
+
+        good_offset = 0
+        with open(self.path, "rb") as f:
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                length, crc = HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                good_offset = f.tell()
+                yield pickle.loads(payload)
+
+        if good_offset < os.path.getsize(self.path):
+            print(f"Truncating torn tail of {self.path} at byte {good_offset}")
+            with open(self.path, "r+b") as f:
+                f.truncate(good_offset)
+                os.fsync(f.fileno())
+
+    def append(self, record: Dict[str, Any]):
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(HEADER.pack(len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,84 @@
+from typing import Callable, Dict, Any, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+import asyncio
+import os
+import time
+
+# PDF parsing is CPU bound and holds the GIL, so by default it gets its own
+# processes; "thread" keeps it in-process (e.g. where spawning is expensive).
+INGEST_PARSE_MODE = os.getenv("INGEST_PARSE_MODE", "process")
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+# One encoder thread: the model already uses every core inside a call, and
+# torch releases the GIL so the event loop keeps running meanwhile.
+INGEST_ENCODE_WORKERS = int(os.getenv("INGEST_ENCODE_WORKERS", 1))
+# Jobs queued or running per pool before new ones are turned away
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", 16))
+
+
+class PoolBusyError(Exception):
+    pass
+
+
+class WorkerPool:
+    """
+    Runs blocking functions off the event loop on a thread or process executor
+    with a bounded backlog: once max_pending jobs are queued or running, run()
+    raises PoolBusyError instead of letting work pile up. The executor is
+    created on first use, so importing the app never spawns processes.
+    """
+
+    def __init__(self, name: str, kind: str, workers: int, max_pending: int = INGEST_MAX_PENDING):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown worker pool kind '{kind}', expected 'thread' or 'process'")
+        self.name = name
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._counts = {"completed": 0, "failed": 0, "rejected": 0}
+        self._busy_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        if self._pending >= self.max_pending:
+            self._counts["rejected"] += 1
+            raise PoolBusyError(f"The {self.name} queue is full, try again shortly")
+
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), partial(fn, *args, **kwargs)
+            )
+        except Exception:
+            self._counts["failed"] += 1
+            raise
+        finally:
+            self._pending -= 1
+            self._busy_seconds += time.perf_counter() - started
+        self._counts["completed"] += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "total_seconds": round(self._busy_seconds, 3),
+            **self._counts
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
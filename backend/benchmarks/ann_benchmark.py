@@ -0,0 +1,112 @@
+"""
+Compare the vector index modes from app/utils/index_factory.py.
+
+For every mode this reports build time, serialized index size (a proxy for
+resident memory) and how many times smaller it is than the float32 flat index,
+p50/p99 single-query latency and recall@k against the exact flat index. Run
+from the project root, e.g.
+
+    python -m backend.benchmarks.ann_benchmark --n 100000
+    python -m backend.benchmarks.ann_benchmark --vectors vector_store/snapshot-000003/vectors.npy
+    python -m backend.benchmarks.ann_benchmark --index faiss_index.bin --modes flat sq_fp16 sq_int8 ivf_pq
+"""
+import argparse
+import time
+import numpy as np
+import faiss
+
+from backend.app.utils.index_factory import INDEX_MODES, build_index, ivf_nlist, training_size
+
+
+def synthetic_vectors(n: int, dimension: int, seed: int = 0) -> np.ndarray:
+    # Clustered unit vectors look more like sentence embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 200, 8), dimension)).astype('float32')
+    vectors = centers[rng.integers(len(centers), size=n)]
+    vectors += 0.35 * rng.standard_normal((n, dimension)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def run(vectors: np.ndarray, queries: np.ndarray, top_k: int, modes):
+    n, dimension = vectors.shape
+    ids = np.arange(n, dtype='int64')
+
+    exact = build_index("flat", dimension)
+    exact.add_with_ids(vectors, ids)
+    _, truth = exact.search(queries, top_k)
+    flat_mb = len(faiss.serialize_index(exact)) / 1e6
+
+    rows = []
+    for mode in modes:
+        nlist = ivf_nlist(n) if mode in ("ivf_flat", "ivf_pq") else 0
+        start = time.perf_counter()
+        training = None
+        if training_size(mode, nlist):
+            size = min(n, training_size(mode, nlist))
+            training = vectors[np.random.default_rng(1).choice(n, size=size, replace=False)]
+        index = build_index(mode, dimension, nlist, training)
+        index.add_with_ids(vectors, ids)
+        build_s = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty((len(queries), top_k), dtype='int64')
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, result = index.search(query[None, :], top_k)
+            latencies.append(time.perf_counter() - start)
+            found[i] = result[0]
+
+        hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+        rows.append({
+            "mode": mode,
+            "nlist": nlist,
+            "build_s": build_s,
+            "memory_mb": len(faiss.serialize_index(index)) / 1e6,
+            "compression": flat_mb / (len(faiss.serialize_index(index)) / 1e6),
+            "p50_ms": percentile_ms(latencies, 50),
+            "p99_ms": percentile_ms(latencies, 99),
+            "recall": hits / truth.size,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", help=".npy file of embeddings (e.g. a snapshot's vectors.npy)")
+    parser.add_argument("--index", help="flat FAISS index file to take the embeddings from (e.g. faiss_index.bin)")
+    parser.add_argument("--n", type=int, default=50000, help="number of synthetic vectors")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=list(INDEX_MODES), choices=INDEX_MODES)
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = np.ascontiguousarray(np.load(args.vectors, mmap_mode='r'), dtype='float32')
+    elif args.index:
+        index = faiss.read_index(args.index)
+        if isinstance(index, faiss.IndexIDMap2):
+            index = faiss.downcast_index(index.index)  # rows in insertion order
+        vectors = index.reconstruct_n(0, index.ntotal)
+    else:
+        vectors = synthetic_vectors(args.n, args.dimension)
+
+    rng = np.random.default_rng(2)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype('float32')
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"{len(vectors)} vectors, dimension {vectors.shape[1]}, {len(queries)} queries, k={args.top_k}")
+    print(f"{'mode':<10}{'nlist':>7}{'build s':>10}{'memory MB':>11}{'smaller':>9}{'p50 ms':>9}{'p99 ms':>9}{'recall@k':>10}")
+    for row in run(vectors, queries, args.top_k, args.modes):
+        print(f"{row['mode']:<10}{row['nlist']:>7}{row['build_s']:>10.2f}{row['memory_mb']:>11.1f}"
+              f"{row['compression']:>8.1f}x{row['p50_ms']:>9.3f}{row['p99_ms']:>9.3f}{row['recall']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare time to first byte of /chatbot with time to first token of
+/chatbot/stream against a running server. Start the server with the stub LLM
+(and no answer cache) so generation time is controlled and nothing external is
+called:
+
+    CHATBOT_LLM=stub CHATBOT_STUB_TOKEN_DELAY=0.02 ANSWER_CACHE=off \\
+        uvicorn backend.app.main:app
+    python -m backend.benchmarks.chat_ttft_benchmark --paper-id 1 --requests 20
+
+Both endpoints run the same retrieval and the same stub generation, so the gap
+between them is the time the user no longer spends waiting on a blank answer.
+"""
+import argparse
+import json
+import time
+import numpy as np
+import httpx
+
+
+def time_blocking(client: httpx.Client, params) -> float:
+    started = time.perf_counter()
+    with client.stream("POST", "/chatbot", params=params) as resp:
+        resp.raise_for_status()
+        next(resp.iter_bytes())
+        first_byte = time.perf_counter() - started
+        resp.read()
+    return first_byte
+
+
+def time_streaming(client: httpx.Client, params):
+    started = time.perf_counter()
+    first_token = None
+    event = None
+    with client.stream("POST", "/chatbot/stream", params=params) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "token" and first_token is None:
+                first_token = time.perf_counter() - started
+            elif line.startswith("data: ") and event == "error":
+                raise RuntimeError(json.loads(line[len("data: "):])["detail"])
+    return first_token, time.perf_counter() - started
+
+
+def summary(samples):
+    samples = np.array(samples) * 1000
+    return f"p50 {np.percentile(samples, 50):8.1f} ms   p95 {np.percentile(samples, 95):8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--paper-id", help="restrict retrieval to this paper")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--query", default="What is the main contribution of this paper?")
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=300) as client:
+        blocking, streaming_first, streaming_total = [], [], []
+        for i in range(args.requests):
+            # A distinct query per round keeps every cache cold
+            params = {"query": f"{args.query} ({i})", "use_cache": "false"}
+            if args.paper_id:
+                params["paper_id"] = args.paper_id
+            blocking.append(time_blocking(client, params))
+            first, total = time_streaming(client, params)
+            streaming_first.append(first)
+            streaming_total.append(total)
+
+    print(f"/chatbot         first byte   {summary(blocking)}")
+    print(f"/chatbot/stream  first token  {summary(streaming_first)}")
+    print(f"/chatbot/stream  complete     {summary(streaming_total)}")
+
+
+if __name__ == "__main__":
+    main()
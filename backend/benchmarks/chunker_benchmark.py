@@ -0,0 +1,116 @@
+"""
+Compare the old character-sized chunker (2000 characters, 6-sentence overlap)
+with the token-budget chunker on real papers:
+
+    python -m backend.benchmarks.chunker_benchmark uploads/ tei_cache/
+    python -m backend.benchmarks.chunker_benchmark paper.pdf --max-tokens 382 --overlap-tokens 64 --json
+
+Arguments are PDFs, GROBID TEI files (.xml) or folders of them. For each
+chunker it reports chunks/sec (chunking only, tokenization included for the
+token chunker) and the wasted-token ratio: the share of every chunk's tokens
+that lie past the model's max sequence length and are cut off before
+embedding. It also reports the share of chunks that get truncated.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+from backend.app.utils.pdf_text import (
+    chunk_sentences, chunk_sentences_by_tokens, chunk_tokenizer, iter_pdf_sentences,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+)
+from backend.app.utils.tei_text import iter_tei_sections
+
+# all-mpnet-base-v2's max_seq_length, special tokens included
+MODEL_MAX_LENGTH = 384
+
+
+def document_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith((".pdf", ".xml")):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def document_sentences(path):
+    """All sentences of a document as (text, char_start, char_end) spans."""
+    if path.lower().endswith(".pdf"):
+        import fitz
+        doc = fitz.open(path)
+        try:
+            return list(iter_pdf_sentences(doc, [], []))
+        finally:
+            doc.close()
+
+    spans, offset = [], 0
+    for _, sentences in iter_tei_sections(path):
+        for text, _ in sentences:
+            spans.append((text, offset, offset + len(text)))
+            offset += len(text) + 1
+    return spans
+
+
+def measure(name, chunker, documents, tokenizer, repeat, model_max_length):
+    chunks = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        chunks = [chunk["text"] for sentences in documents for chunk in chunker(sentences)]
+    seconds = (time.perf_counter() - started) / repeat
+
+    lengths = [len(ids) for ids in tokenizer(chunks, add_special_tokens=True)["input_ids"]] if chunks else []
+    total = sum(lengths)
+    wasted = sum(max(0, length - model_max_length) for length in lengths)
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "chunks_per_sec": round(len(chunks) / seconds, 1) if seconds else None,
+        "mean_tokens": round(total / len(chunks), 1) if chunks else None,
+        "truncated_chunks": round(sum(length > model_max_length for length in lengths) / len(chunks), 4) if chunks else None,
+        "wasted_token_ratio": round(wasted / total, 4) if total else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDFs, TEI files or folders")
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--model-max-length", type=int, default=MODEL_MAX_LENGTH)
+    parser.add_argument("--repeat", type=int, default=3, help="chunking passes timed per chunker")
+    parser.add_argument("--json", action="store_true", help="print one JSON line instead of a table")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):  # keep the load message out of --json output
+        tokenizer = chunk_tokenizer.get()
+    documents = [document_sentences(path) for path in document_paths(args.paths)]
+    documents = [sentences for sentences in documents if sentences]
+    if not documents:
+        parser.error("no PDF or TEI documents with text found")
+
+    results = [
+        measure("chars-2000/6-sentences", lambda s: chunk_sentences(s, 2000, 6),
+                documents, tokenizer, args.repeat, args.model_max_length),
+        measure(f"tokens-{args.max_tokens}/{args.overlap_tokens}",
+                lambda s: chunk_sentences_by_tokens(s, args.max_tokens, args.overlap_tokens, tokenizer),
+                documents, tokenizer, args.repeat, args.model_max_length),
+    ]
+
+    if args.json:
+        print(json.dumps({"documents": len(documents), "results": results}))
+        return
+    print(f"{len(documents)} documents, model max length {args.model_max_length} tokens")
+    print(f"{'chunker':28} {'chunks':>7} {'chunks/s':>10} {'mean tok':>9} {'truncated':>10} {'wasted':>8}")
+    for r in results:
+        print(f"{r['chunker']:28} {r['chunks']:7d} {r['chunks_per_sec']:10} {r['mean_tokens']:9} "
+              f"{r['truncated_chunks']:10.1%} {r['wasted_token_ratio']:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
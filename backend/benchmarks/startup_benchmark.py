@@ -0,0 +1,91 @@
+"""
+Measure how long the backend takes to come up, each run in a fresh Python
+process so nothing is already imported or loaded:
+
+    python -m backend.benchmarks.startup_benchmark --runs 5
+    python -m backend.benchmarks.startup_benchmark --runs 5 --json >> startup_history.jsonl
+
+Reported per run, then as the median over runs:
+  import   time to `import backend.app.main`
+  startup  time for the startup hook (vector store load, warmup thread kick-off)
+  ready    time from process start until /ready returns 200
+
+Run it from the repository root with the same environment as the server
+(database, WARMUP_ON_STARTUP, CHATBOT_LLM) and keep the JSON lines around to
+compare releases.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+from backend.app import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    up = time.perf_counter()
+    deadline = up + {timeout}
+    while client.get("/ready").status_code != 200:
+        if time.perf_counter() > deadline:
+            break
+        time.sleep(0.05)
+    ready = time.perf_counter() if client.get("/ready").status_code == 200 else None
+    components = client.get("/ready").json()["components"]
+print("STARTUP_BENCHMARK " + json.dumps({{
+    "import_seconds": imported - started,
+    "startup_seconds": up - imported,
+    "ready_seconds": ready - started if ready else None,
+    "components": components,
+}}))
+"""
+
+
+def run_once(timeout: float):
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", CHILD.format(timeout=timeout)],
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    for line in proc.stdout.splitlines():
+        if line.startswith("STARTUP_BENCHMARK "):
+            result = json.loads(line[len("STARTUP_BENCHMARK "):])
+            result["process_seconds"] = wall
+            return result
+    raise RuntimeError(f"benchmark process failed:\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for /ready")
+    parser.add_argument("--json", action="store_true", help="print one JSON line instead of a table")
+    args = parser.parse_args()
+
+    runs = []
+    for i in range(args.runs):
+        result = run_once(args.timeout)
+        runs.append(result)
+        if not args.json:
+            ready = f"{result['ready_seconds']:7.2f} s" if result["ready_seconds"] is not None else "  never"
+            print(f"run {i + 1}: import {result['import_seconds']:6.2f} s   "
+                  f"startup {result['startup_seconds']:6.2f} s   ready {ready}")
+
+    def median(key):
+        values = [r[key] for r in runs if r[key] is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    summary = {key: median(key) for key in ("import_seconds", "startup_seconds", "ready_seconds", "process_seconds")}
+    if args.json:
+        print(json.dumps({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "runs": args.runs,
+                          "median": summary, "components": runs[-1]["components"]}))
+    else:
+        print(f"median: import {summary['import_seconds']} s   startup {summary['startup_seconds']} s   "
+              f"ready {summary['ready_seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
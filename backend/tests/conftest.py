@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app as backend.app, like the benchmarks run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+@pytest.fixture(scope="session")
+def app_main(tmp_path_factory):
+    """
+    The FastAPI app module on a SQLite database, imported from a scratch
+    directory since it creates its upload and vector store folders in the
+    working directory.
+    """
+    workdir = tmp_path_factory.mktemp("app")
+    os.chdir(workdir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'papers.db'}"
+    os.environ["WARMUP_ON_STARTUP"] = "off"
+    from backend.app import main
+    return main
+
+
+@pytest.fixture
+def stub_chatbot(tmp_path, monkeypatch):
+    """The chatbot module answering with the local stub LLM (CHATBOT_LLM=stub) into a fresh answer cache."""
+    from backend.app.utils import chatbot
+    from backend.app.utils.answer_cache import AnswerCache
+    monkeypatch.setattr(chatbot, "CHATBOT_LLM", "stub")
+    monkeypatch.setattr(chatbot, "CHATBOT_STUB_TOKEN_DELAY", 0)
+    monkeypatch.setattr(chatbot, "answer_cache", AnswerCache(str(tmp_path / "answers.sqlite3")))
+    return chatbot
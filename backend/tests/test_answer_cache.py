@@ -0,0 +1,99 @@
+import itertools
+
+import pytest
+
+from backend.app.utils import answer_cache as answer_cache_module
+from backend.app.utils.answer_cache import AnswerCache, answer_key
+
+SECTIONS = [
+    {"paper_id": 1, "vector_id": 10, "text": "Attention weighs every token against every other."},
+    {"paper_id": 2, "vector_id": 20, "text": "Transformers drop recurrence entirely."},
+]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing time.time(), so least-recently-used order never ties."""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(answer_cache_module.time, "time", lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def generated(stub_chatbot, monkeypatch):
+    """Queries the stub LLM was actually asked to answer."""
+    calls = []
+    generate = stub_chatbot.generate_answer
+
+    def counting(query, top_sections):
+        calls.append(query)
+        return generate(query, top_sections)
+
+    monkeypatch.setattr(stub_chatbot, "generate_answer", counting)
+    return calls
+
+
+def test_answer_key_covers_query_chunks_prompt_and_model():
+    key = answer_key("what is attention", [10, 20], "1", "stub")
+    assert key == answer_key("what is attention", [10, 20], "1", "stub")
+    assert key != answer_key("what is attention", [10, 21], "1", "stub")
+    assert key != answer_key("what is attention", [10, 20], "2", "stub")
+    assert key != answer_key("what is attention", [10, 20], "1", "groq/gemma2-9b-it")
+
+
+def test_cache_hit_and_persistence(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(path)
+    assert cache.get("key") is None
+    cache.put("key", "an answer")
+    assert cache.get("key") == "an answer"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    # Answers survive a restart
+    assert AnswerCache(path).get("key") == "an answer"
+
+
+def test_least_recently_used_answers_are_evicted(tmp_path, clock):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), max_entries=2)
+    cache.put("a", "answer a")
+    cache.put("b", "answer b")
+    cache.get("a")
+    cache.put("c", "answer c")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "answer a"
+    assert cache.get("c") == "answer c"
+
+
+def test_repeated_query_is_answered_from_cache(stub_chatbot, generated):
+    first = stub_chatbot.answer_user_query("What is attention?", SECTIONS)
+    # Normalized: case and surrounding whitespace do not matter
+    second = stub_chatbot.answer_user_query("  what is attention?", SECTIONS)
+
+    assert first == second == stub_chatbot.stub_answer("What is attention?", SECTIONS)
+    assert generated == ["What is attention?"]
+    assert stub_chatbot.answer_cache.stats()["hits"] == 1
+
+
+def test_other_sections_miss_the_cache(stub_chatbot, generated):
+    stub_chatbot.answer_user_query("What is attention?", SECTIONS)
+    stub_chatbot.answer_user_query("What is attention?", SECTIONS[:1])
+    assert len(generated) == 2
+
+
+def test_use_cache_false_bypasses_the_cache(stub_chatbot, generated):
+    stub_chatbot.answer_user_query("What is attention?", SECTIONS, use_cache=False)
+    stub_chatbot.answer_user_query("What is attention?", SECTIONS, use_cache=False)
+
+    assert len(generated) == 2
+    assert stub_chatbot.answer_cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_is_bypassed(stub_chatbot, generated):
+    stub_chatbot.answer_cache.enabled = False
+    stub_chatbot.answer_user_query("What is attention?", SECTIONS)
+    stub_chatbot.answer_user_query("What is attention?", SECTIONS)
+
+    assert len(generated) == 2
+    assert stub_chatbot.answer_cache.stats()["entries"] == 0
@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.models import Base, Paper
+from backend.app.utils import bulk_import
+from backend.app.utils.bulk_import import BulkImporter, StageTimer
+
+
+def make_importer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'papers.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    importer = BulkImporter(session_factory, None, "http://grobid", str(tmp_path),
+                            parse_tei=None, extract_chunks=None, embed=None)
+    return importer, session_factory
+
+
+def make_item(tmp_path, name, pdf_hash):
+    path = tmp_path / name
+    path.write_bytes(b"%PDF-1.4")
+    return {"file": name, "pdf_hash": pdf_hash, "pdf_path": str(path),
+            "metadata": {"title": name, "authors": [{"name": "Ada Lovelace"}], "keywords": ["notes"]}}
+
+
+def test_a_bad_row_only_fails_its_own_paper(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import, "INSERT_BATCH_PAPERS", 2)
+    importer, session_factory = make_importer(tmp_path)
+    items = [make_item(tmp_path, f"paper{i}.pdf", f"{i:064x}") for i in range(5)]
+    items[3]["pdf_hash"] = items[2]["pdf_hash"]  # violates the unique pdf_hash index
+    report = {"failed": []}
+
+    inserted = importer._insert_rows(items, ["Reading group"], StageTimer(), report)
+
+    assert [item["file"] for item in inserted] == ["paper0.pdf", "paper1.pdf", "paper2.pdf", "paper4.pdf"]
+    assert [failure["file"] for failure in report["failed"]] == ["paper3.pdf"]
+    assert not (tmp_path / "paper3.pdf").exists()
+    assert (tmp_path / "paper2.pdf").exists()
+
+    db = session_factory()
+    try:
+        titles = sorted(title for title, in db.query(Paper.title))
+        assert titles == ["paper0.pdf", "paper1.pdf", "paper2.pdf", "paper4.pdf"]
+        paper = db.query(Paper).filter(Paper.title == "paper4.pdf").one()
+        assert [author.name for author in paper.authors] == ["Ada Lovelace"]
+        assert [collection.name for collection in paper.collections] == ["Reading group"]
+    finally:
+        db.close()
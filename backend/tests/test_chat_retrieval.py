@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from backend.app.utils.vector_store import VectorStore
+
+DIMENSION = 16
+
+
+def test_retrieval_waits_for_ingest_off_the_event_loop(app_main, tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((5, DIMENSION)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    store = VectorStore(DIMENSION, str(tmp_path), "flat")
+    store.compact()
+    store.add_paper(1, [f"chunk {i}" for i in range(5)], vectors)
+
+    async def embed_query(query):
+        return vectors[:1]
+
+    monkeypatch.setattr(app_main, "vector_store", store)
+    monkeypatch.setattr(app_main, "embed_query", embed_query)
+
+    # An ingest holding the write side for a while, as _apply or a compaction swap does
+    writing = threading.Event()
+
+    def ingest():
+        with store._state_lock.write():
+            writing.set()
+            time.sleep(0.5)
+
+    async def run():
+        writer = threading.Thread(target=ingest)
+        writer.start()
+        writing.wait()
+        search = asyncio.ensure_future(app_main.search_similar_chunks("what is attention", top_k=2))
+        # The loop keeps serving other work while the search waits for the lock
+        ticks = 0
+        while not search.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        writer.join()
+        return ticks, await search
+
+    ticks, results = asyncio.run(run())
+    assert ticks > 10
+    assert [result["paper_id"] for result in results] == ["1", "1"]
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+SECTIONS = [
+    {"paper_id": 1, "vector_id": 10, "text": "Attention weighs every token against every other."},
+    {"paper_id": 2, "vector_id": 20, "text": "Transformers drop recurrence entirely."},
+]
+
+
+@pytest.fixture
+def client(app_main, stub_chatbot, monkeypatch):
+    async def search_similar_chunks(query, paper_ids=None, top_k=5):
+        return SECTIONS[:top_k]
+
+    monkeypatch.setattr(app_main, "search_similar_chunks", search_similar_chunks)
+    return TestClient(app_main.app)
+
+
+def stream_events(client, **params):
+    """(event, data) pairs of a /chatbot/stream response, in the order they were sent."""
+    response = client.post("/chatbot/stream", params={"query": "What is attention?", **params})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_sources_then_tokens_then_done(client, stub_chatbot):
+    events = stream_events(client)
+    names = [name for name, _ in events]
+
+    assert names[0] == "sources"
+    assert events[0][1] == SECTIONS[:2]
+    assert names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    assert len(names) > 3
+
+    answer = "".join(data for name, data in events if name == "token")
+    assert answer == stub_chatbot.stub_answer("What is attention?", SECTIONS[:2])
+    done = events[-1][1]
+    assert done["first_token_ms"] is not None
+    assert done["total_ms"] >= done["first_token_ms"]
+
+
+def test_cached_answer_streams_as_one_token(client, stub_chatbot):
+    streamed = stream_events(client)
+    cached = stream_events(client)
+
+    assert [name for name, _ in cached] == ["sources", "token", "done"]
+    assert cached[1][1] == "".join(data for name, data in streamed if name == "token")
+
+
+def test_stream_reports_errors_as_an_event(client, app_main, monkeypatch):
+    async def failing_search(query, paper_ids=None, top_k=5):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(app_main, "search_similar_chunks", failing_search)
+    assert stream_events(client) == [("error", {"detail": "index unavailable"})]
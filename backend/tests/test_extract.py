@@ -0,0 +1,21 @@
+import hashlib
+
+from fastapi.testclient import TestClient
+
+PDF = b"%PDF-1.4\n% a test paper\n%%EOF\n"
+
+
+def test_extract_returns_the_cached_result_of_a_known_pdf(app_main):
+    pdf_hash = hashlib.sha256(PDF).hexdigest()
+    app_main.tei_cache.put_tei(pdf_hash, b"<TEI/>")
+    app_main.tei_cache.put_result(pdf_hash, {"title": "Attention Is All You Need", "keywords": ["nlp"]})
+
+    client = TestClient(app_main.app)
+    response = client.post("/extract/", files={"file": ("attention.pdf", PDF, "application/pdf")})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["cache_hit"] is True
+    assert body["title"] == "Attention Is All You Need"
+    assert body["pdf_hash"] == pdf_hash
+    assert body["pdf_filename"] == "attention.pdf"
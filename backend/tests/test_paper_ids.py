@@ -0,0 +1,29 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def client(app_main):
+    return TestClient(app_main.app)
+
+
+@pytest.mark.parametrize("method, url, kwargs", [
+    ("post", "/upload_paper", {"json": {"paper_id": "abc", "pdf_path": "paper.pdf"}}),
+    ("get", "/storage_stats/abc", {}),
+    ("post", "/chatbot", {"params": {"query": "attention", "paper_id": "abc"}}),
+    ("post", "/chatbot", {"params": {"query": "attention", "paper_ids": ["1", "abc"]}}),
+    ("post", "/chatbot/stream", {"params": {"query": "attention", "paper_id": "abc"}}),
+])
+def test_non_numeric_paper_ids_are_rejected(client, method, url, kwargs):
+    response = getattr(client, method)(url, **kwargs)
+    assert response.status_code == 422
+
+
+def test_storage_stats_of_unindexed_paper(client):
+    assert client.get("/storage_stats/123456").status_code == 404
+
+
+def test_storage_stats_summary_does_not_list_papers(client):
+    stats = client.get("/storage_stats").json()
+    assert "papers" not in stats
+    assert "papers_indexed" in stats
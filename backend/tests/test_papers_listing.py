@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from backend.app.models import Paper, Author, Tags, Collection
+
+PAPERS = 60
+
+
+@pytest.fixture(scope="module")
+def client(app_main):
+    db = app_main.SessionLocal()
+    try:
+        collections = [Collection(name=f"Collection {i}") for i in range(3)]
+        tags = [Tags(name=f"tag{i}") for i in range(5)]
+        start = datetime(2024, 1, 1)
+        for i in range(PAPERS):
+            db.add(Paper(
+                title=f"Paper {i}",
+                abstract=f"Abstract of paper {i}",
+                pdf_hash=f"{i:064x}",
+                added_on=start + timedelta(hours=i),
+                authors=[Author(name=f"Author {i} A"), Author(name=f"Author {i} B")],
+                tags=[tags[i % 5], tags[(i + 1) % 5]],
+                collections=[collections[i % 3]],
+            ))
+        db.commit()
+    finally:
+        db.close()
+    # No "with": the startup hooks load models and vector stores the listing does not need
+    return TestClient(app_main.app)
+
+
+@pytest.fixture
+def statements(app_main):
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    from backend.app.database import engine
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def fetch(client, statements, **params):
+    statements.clear()
+    response = client.get("/papers", params=params)
+    assert response.status_code == 200
+    return response.json(), len(statements)
+
+
+def test_papers_query_count_is_constant_in_page_size(client, statements):
+    counts = {}
+    for limit in (1, 5, 20, 50):
+        page, counts[limit] = fetch(client, statements, limit=limit)
+        assert len(page["items"]) == limit
+        assert page["total"] == PAPERS
+        for item in page["items"]:
+            assert len(item["authors"]) == 2
+            assert len(item["keywords"]) == 2
+            assert len(item["collections"]) == 1
+
+    # A count, the page, then one batched query each for authors, tags and collections
+    assert set(counts.values()) == {5}, counts
+
+
+def test_papers_cursor_pages_cost_the_same(client, statements):
+    first, first_count = fetch(client, statements, limit=25)
+    second, second_count = fetch(client, statements, limit=25, cursor=first["next_cursor"])
+    last, last_count = fetch(client, statements, limit=25, cursor=second["next_cursor"])
+
+    assert first_count == second_count == last_count == 5
+    assert len(last["items"]) == PAPERS - 50
+    assert last["next_cursor"] is None
+    ids = [item["paper_id"] for page in (first, second, last) for item in page["items"]]
+    assert len(set(ids)) == PAPERS
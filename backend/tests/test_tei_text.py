@@ -0,0 +1,65 @@
+import re
+
+import pytest
+
+from backend.app.utils import pdf_text
+from backend.app.utils.lazy import LazyResource
+from backend.app.utils.tei_text import iter_chunks_from_tei
+
+
+class WordTokenizer:
+    """Tokenizes on words and punctuation, with the call signature of a HF tokenizer."""
+
+    def _encode(self, text):
+        spans = [(m.start(), m.end()) for m in re.finditer(r"\w+|[^\w\s]", text)]
+        return list(range(len(spans))), spans
+
+    def __call__(self, texts, add_special_tokens=True, return_offsets_mapping=False):
+        single = isinstance(texts, str)
+        encoded = [self._encode(text) for text in ([texts] if single else texts)]
+        result = {"input_ids": [ids for ids, _ in encoded], "offset_mapping": [spans for _, spans in encoded]}
+        return {key: value[0] for key, value in result.items()} if single else result
+
+
+@pytest.fixture(autouse=True)
+def word_tokenizer(monkeypatch):
+    monkeypatch.setattr(pdf_text, "chunk_tokenizer", LazyResource("test tokenizer", WordTokenizer))
+
+
+def tei_document(body: str) -> bytes:
+    return (
+        '<TEI xmlns="http://www.tei-c.org/ns/1.0"><teiHeader><fileDesc><titleStmt>'
+        '<title>Test</title></titleStmt></fileDesc></teiHeader>'
+        f'<text><body>{body}</body></text></TEI>'
+    ).encode()
+
+
+def test_sentence_over_the_token_budget_is_split_with_pages():
+    long_sentence = " ".join(f"word{i}" for i in range(50)) + "."
+    tei = tei_document(
+        '<div><head>Method</head><p>'
+        '<s coords="2,1,1,1,1">A short opening sentence.</s>'
+        f'<s coords="3,1,1,1,1">{long_sentence}</s>'
+        '<s coords="4,1,1,1,1">The closing sentence.</s>'
+        '</p></div>'
+    )
+
+    chunks = list(iter_chunks_from_tei(tei, max_tokens=20, overlap_tokens=4))
+
+    body_text = " ".join(["A short opening sentence.", long_sentence, "The closing sentence."])
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert chunk["tokens"] <= 20
+        assert chunk["text"] == "Method: " + body_text[chunk["char_start"]:chunk["char_end"]]
+    assert chunks[0]["page_start"] == 2
+    assert chunks[-1]["page_end"] == 4
+    inside_long = [chunk for chunk in chunks
+                   if chunk["char_start"] > len("A short opening sentence. ")
+                   and chunk["char_end"] < len(body_text) - len("The closing sentence.")]
+    assert inside_long and all(chunk["page_start"] == chunk["page_end"] == 3 for chunk in inside_long)
+
+
+def test_pages_are_unknown_without_coordinates():
+    tei = tei_document("<div><p><s>First sentence here.</s><s>Second one.</s></p></div>")
+    chunks = list(iter_chunks_from_tei(tei, max_tokens=20, overlap_tokens=4))
+    assert [(chunk["page_start"], chunk["page_end"]) for chunk in chunks] == [(-1, -1)]
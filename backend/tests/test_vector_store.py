@@ -0,0 +1,84 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.app.utils.vector_store import VectorStore
+
+DIMENSION = 768
+
+
+def unit_vectors(rng, n):
+    vectors = rng.standard_normal((n, DIMENSION)).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_search_while_adding_and_compacting(tmp_path):
+    # FAISS crashes when an index is searched while it is being added to; the
+    # store's state lock must keep ingest, deletes and compaction away from searches
+    rng = np.random.default_rng(0)
+    store = VectorStore(DIMENSION, str(tmp_path), "flat")
+    store.compact()
+    store.add_paper(0, ["seed"] * 20, unit_vectors(rng, 20))
+    query = unit_vectors(rng, 1)
+    errors = []
+
+    def ingest():
+        try:
+            local = np.random.default_rng(1)
+            for paper_id in range(1, 300):
+                store.add_paper(paper_id, ["chunk"] * 20, unit_vectors(local, 20))
+                if paper_id % 7 == 0:
+                    store.delete_paper(paper_id - 3)
+                if paper_id % 100 == 0:
+                    store.compact(purge=True)
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=ingest)
+    writer.start()
+    searches = 0
+    while writer.is_alive():
+        assert len(store.search(query, 5)) == 5
+        store.search(query, 5, paper_ids=[1, 2, 3])
+        searches += 1
+    writer.join()
+
+    assert not errors
+    assert searches > 0
+    assert store.ntotal == 20 * (300 - len(range(7, 300, 7)))
+
+
+def test_deleted_papers_are_not_returned(tmp_path):
+    rng = np.random.default_rng(0)
+    store = VectorStore(DIMENSION, str(tmp_path), "flat")
+    store.compact()
+    vectors = unit_vectors(rng, 3)
+    for paper_id, vector in enumerate(vectors):
+        store.add_paper(paper_id, [f"paper {paper_id}"], vector[None, :])
+
+    assert store.search(vectors[1][None, :], 1)[0]["paper_id"] == "1"
+    store.delete_paper(1)
+    assert all(hit["paper_id"] != "1" for hit in store.search(vectors[1][None, :], 3))
+
+
+def test_unloaded_store_refuses_unlogged_writes(tmp_path):
+    store = VectorStore(DIMENSION, str(tmp_path), "flat")
+    with pytest.raises(RuntimeError):
+        store.add_paper(0, ["chunk"], unit_vectors(np.random.default_rng(0), 1))
+    assert store.ntotal == 0
+
+
+def test_failed_migration_leaves_store_not_ready(app_main, tmp_path, monkeypatch):
+    store = VectorStore(app_main.dimension, str(tmp_path), "flat")
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "set_legacy_state", fail)
+    monkeypatch.setattr(app_main, "vector_store", store)
+    monkeypatch.setattr(app_main, "vector_store_loaded", False)
+    app_main.load_index_and_metadata()
+
+    assert not app_main.vector_store_loaded
+    assert store.wal is None
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { BrowserRouter as Router, Routes, Route } from 'react-router-dom';
 // import { useNavigate } from 'react-router-dom';
 
@@ -36,7 +36,7 @@ function HomePage(props) {
           onCollectionSelect={props.handleCollectionSelect}
           selectedStatus={props.selectedStatus}
           selectedCollection={props.selectedCollection}
-          favorites={props.favoritePapers}
+          favoritesCount={props.favoritesCount}
           onFavoritesClick={props.toggleShowFavorites}
           showFavoritesOnly={props.showFavoritesOnly}
           collections={props.collections}
@@ -64,6 +64,9 @@ function HomePage(props) {
             {activeTabId === 'papersList' && (
               <PapersList
                 papers_list={props.displayPapers}
+                totalPapers={props.totalPapers}
+                hasMore={props.hasMore}
+                onLoadMore={props.loadMorePapers}
                 viewMode={props.viewMode}
                 onViewModeChange={props.handleViewModeChange}
                 sortOrder={props.sortOrder}
@@ -93,7 +96,9 @@ function HomePage(props) {
 
 function App() {
   const [papers, setPapers] = useState([]);
-  const [favorites, setFavorites] = useState([]);
+  const [totalPapers, setTotalPapers] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [favoritesCount, setFavoritesCount] = useState(0);
   const [selectedStatus, setSelectedStatus] = useState('All Papers');
   const [selectedCollection, setSelectedCollection] = useState(null);
   const [selectedTag, setSelectedTag] = useState(null);
@@ -144,21 +149,69 @@ function App() {
     fetchCollections();
   }, []);
 
-  const fetchPapers = async () => {
+  const SORT_PARAMS = {
+    'Date Added': 'date_added',
+    'Publication Date': 'publication_date',
+    'Title': 'title',
+  };
+  const PAGE_SIZE = 50;
+
+  // Filtering, searching and sorting all happen in SQL; the list only holds the pages loaded so far.
+  // A search is ranked by relevance on the server, so it ignores the sort order.
+  const buildPapersQuery = (cursor) => {
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (searchQuery.trim()) params.set('q', searchQuery.trim());
+    else params.set('sort', SORT_PARAMS[sortOrder] || 'date_added');
+    if (cursor) params.set('cursor', cursor);
+    if (showFavoritesOnly) params.set('favourite', 'true');
+    if (selectedStatus && selectedStatus !== 'All Papers') params.set('status', selectedStatus);
+    if (selectedCollection) params.set('collection', selectedCollection);
+    if (selectedTag) params.set('tag', selectedTag);
+    return params.toString();
+  };
+
+  // Responses from an outdated filter/search must not overwrite the current list
+  const requestIdRef = useRef(0);
+
+  const fetchPapers = async (cursor = null) => {
+    const requestId = ++requestIdRef.current;
     try {
-      const response = await fetch('http://127.0.0.1:8000/papers');
+      const endpoint = searchQuery.trim() ? 'papers/search' : 'papers';
+      const response = await fetch(`http://127.0.0.1:8000/${endpoint}?${buildPapersQuery(cursor)}`);
       const data = await response.json();
-      setPapers(data);
-      setFavorites(data.filter(paper => paper.isFavourite));
+      if (requestId !== requestIdRef.current) return;
+      setPapers(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setTotalPapers(data.total);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error('Error fetching papers:', error);
     }
   };
 
+  const fetchFavoritesCount = async () => {
+    try {
+      const response = await fetch('http://127.0.0.1:8000/papers?favourite=true&limit=1');
+      const data = await response.json();
+      setFavoritesCount(data.total);
+    } catch (error) {
+      console.error('Error fetching favorites count:', error);
+    }
+  };
+
   useEffect(() => {
-    fetchPapers();
+    fetchFavoritesCount();
   }, []);
 
+  useEffect(() => {
+    const timer = setTimeout(() => fetchPapers(), searchQuery ? 300 : 0);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [sortOrder, selectedStatus, selectedCollection, selectedTag, showFavoritesOnly, searchQuery]);
+
+  const loadMorePapers = () => {
+    if (nextCursor) fetchPapers(nextCursor);
+  };
+
   const toggleFavorite = async (paperId) => {
     try {
       const paperToUpdate = papers.find(p => p.paper_id === paperId);
@@ -179,6 +232,7 @@ function App() {
             p.paper_id === paperId ? { ...p, isFavourite } : p
           )
         );
+        setFavoritesCount(prev => prev + (isFavourite ? 1 : -1));
       } else {
         console.error('Failed to update favorite status');
       }
@@ -201,7 +255,12 @@ function App() {
         method: 'DELETE',
       });
       if (response.ok) {
+        const deleted = papers.find(paper => paper.paper_id === paperId);
         setPapers(prev => prev.filter(paper => paper.paper_id !== paperId));
+        setTotalPapers(prev => Math.max(prev - 1, 0));
+        if (deleted && deleted.isFavourite) {
+          setFavoritesCount(prev => Math.max(prev - 1, 0));
+        }
       } else {
         console.error("Failed to delete paper");
       }
@@ -210,20 +269,6 @@ function App() {
     }
   };
 
-  const searchPapers = (papers, query) => {
-    if (!query) return papers;
-    const lowerQuery = query.toLowerCase();
-    return papers.filter(paper => {
-      return (
-        (paper.title?.toLowerCase().includes(lowerQuery)) ||
-        (paper.authors?.some(author => author?.name?.toLowerCase().includes(lowerQuery))) ||
-        (paper.abstract?.toLowerCase().includes(lowerQuery)) ||
-        (paper.keywords?.some(keyword => keyword.toLowerCase().includes(lowerQuery))) ||
-        (paper.status?.toLowerCase().includes(lowerQuery))
-      );
-    });
-  };
-
 
   function openPdfTab(paper) {
     setTabs(prevTabs => {
@@ -260,34 +305,6 @@ function App() {
     });
   }
 
-  const filteredPapers = papers.filter(paper => {
-    if (selectedStatus && selectedStatus !== 'All Papers' && paper.status !== selectedStatus) {
-      return false;
-    }
-    if (selectedCollection && paper.collections && !paper.collections.includes(selectedCollection)) {
-      return false;
-    }
-    if (selectedTag && paper.keywords && !paper.keywords.includes(selectedTag)) {
-      return false;
-    }
-    return true;
-  });
-
-  const searchFilteredPapers = searchQuery
-    ? searchPapers(filteredPapers, searchQuery)
-    : filteredPapers;
-
-  const sortedPapers = [...searchFilteredPapers].sort((a, b) => {
-    if (sortOrder === 'Date Added') {
-      return new Date(b.addedDate) - new Date(a.addedDate);
-    } else if (sortOrder === 'Publication Date') {
-      return new Date(b.publication_date) - new Date(a.publication_date);
-    } else if (sortOrder === 'Title') {
-      return a.title.localeCompare(b.title);
-    }
-    return 0;
-  });
-
   const handleStatusSelect = (status) => {
     setSelectedStatus(status);
     setSelectedCollection(null);
@@ -317,8 +334,9 @@ function App() {
   const toggleAddPaperForm = () => setShowAddPaperForm(prev => !prev);
   const handleAddPaper = (newPaper) => {
     setPapers(prev => [newPaper, ...prev]);
+    setTotalPapers(prev => prev + 1);
     if (newPaper.isFavourite) {
-      setFavorites(prev => [...prev, newPaper]);
+      setFavoritesCount(prev => prev + 1);
     }
   };
 
@@ -334,12 +352,7 @@ function App() {
     setActiveTabId('papersList');
   };
 
-  const favoritePapers = papers.filter(p => p.isFavourite);
-  const searchedFavoritePapers = searchQuery
-    ? searchPapers(favoritePapers, searchQuery)
-    : favoritePapers;
-
-  const displayPapers = showFavoritesOnly ? searchedFavoritePapers : sortedPapers;
+  const displayPapers = papers;
 
   return (
       <div className="app">
@@ -361,13 +374,16 @@ function App() {
                 selectedStatus={selectedStatus}
                 selectedCollection={selectedCollection}
                 selectedTag={selectedTag}
-                favoritePapers={favoritePapers}
+                favoritesCount={favoritesCount}
                 toggleShowFavorites={toggleShowFavorites}
                 showFavoritesOnly={showFavoritesOnly}
                 showAddPaperForm={showAddPaperForm}
                 handleAddPaper={handleAddPaper}
                 setShowAddPaperForm={setShowAddPaperForm}
                 displayPapers={displayPapers}
+                totalPapers={totalPapers}
+                hasMore={Boolean(nextCursor)}
+                loadMorePapers={loadMorePapers}
                 viewMode={viewMode}
                 handleViewModeChange={handleViewModeChange}
                 toggleFavorite={toggleFavorite}
@@ -86,7 +86,11 @@ function AddPaperForm({ onAddPaper, onCancel }) {
       }));
     } catch (error) {
       console.error('Error uploading file:', error);
-      alert('Failed to extract paper data.');
+      if (error.response?.status === 409) {
+        alert(error.response.data.detail.message);
+      } else {
+        alert('Failed to extract paper data.');
+      }
     } finally {
       setIsLoading(false);
     }
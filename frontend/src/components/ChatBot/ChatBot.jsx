@@ -71,28 +71,67 @@ const ChatBot = ({ onClose, paperId }) => {
         top_k: topK.toString(),
       });         
 
-      const response = await fetch(`http://127.0.0.1:8000/chatbot?${queryParams.toString()}`, {
+      // Tokens are appended to this message as they stream in
+      setMessages((msgs) => [...msgs, { sender: 'bot', text: '' }]);
+      const appendToReply = (text) =>
+        setMessages((msgs) => {
+          const updated = [...msgs];
+          const last = updated[updated.length - 1];
+          updated[updated.length - 1] = { ...last, text: last.text + text };
+          return updated;
+        });
+
+      const response = await fetch(`http://127.0.0.1:8000/chatbot/stream?${queryParams.toString()}`, {
         method: 'POST',
         headers: {
-          'Accept': 'application/json',
+          'Accept': 'text/event-stream',
         },
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error(`API error: ${response.status}`);
       }
 
-      const data = await response.json();
-      setMessages((msgs) => [
-        ...msgs,
-        { sender: 'bot', text: data || 'No reply from model.' },
-      ]);
+      // Server-Sent Events: blocks of "event: <name>" / "data: <json>" separated by a blank line
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let receivedText = false;
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const block of events) {
+          const eventLine = block.split('\n').find((line) => line.startsWith('event: '));
+          const dataLine = block.split('\n').find((line) => line.startsWith('data: '));
+          if (!eventLine || !dataLine) continue;
+          const eventName = eventLine.slice('event: '.length);
+          const data = JSON.parse(dataLine.slice('data: '.length));
+
+          if (eventName === 'token') {
+            receivedText = true;
+            appendToReply(data);
+          } else if (eventName === 'error') {
+            throw new Error(data.detail);
+          }
+        }
+      }
+
+      if (!receivedText) {
+        appendToReply('No reply from model.');
+      }
     } catch (error) {
       console.error('Error talking to chatbot API:', error);
-      setMessages((msgs) => [
-        ...msgs,
-        { sender: 'bot', text: 'Sorry, something went wrong while contacting the chatbot.' },
-      ]);
+      setMessages((msgs) => {
+        const failed = { sender: 'bot', text: 'Sorry, something went wrong while contacting the chatbot.' };
+        const last = msgs[msgs.length - 1];
+        // Replace the empty reply placeholder rather than leaving it behind
+        return last && last.sender === 'bot' && !last.text ? [...msgs.slice(0, -1), failed] : [...msgs, failed];
+      });
     }
   };
 
@@ -4,13 +4,14 @@ import './PapersList.css';
 
 function PapersList({
   papers_list, viewMode, onPaperClick, onViewModeChange, sortOrder = 'Date Added', onSortChange, toggleFavorite, updatePaperStatus , deletePaper, fetchPaper,
+  totalPapers, hasMore = false, onLoadMore = () => {},
 }) {
   const validPapers = Array.isArray(papers_list) ? papers_list : [];
 
   return (
     <div className="papers-container">
       <div className="papers-header">
-        <h2 className="papers-title">Papers ({validPapers.length})</h2>
+        <h2 className="papers-title">Papers ({totalPapers ?? validPapers.length})</h2>
         <div className="papers-actions">
           <div className="sort-dropdown">
             <span>Sort by:</span>
@@ -68,6 +69,12 @@ function PapersList({
           ))
         )}
       </div>
+
+      {hasMore && (
+        <button className="load-more-button" onClick={onLoadMore}>
+          Load more
+        </button>
+      )}
     </div>
   );
 }
@@ -6,7 +6,7 @@ function Sidebar({
   onCollectionSelect = () => {},
   selectedStatus = "All Papers",
   selectedCollection = null,
-  favorites = [],
+  favoritesCount = 0,
   onFavoritesClick = () => {},
   showFavoritesOnly = false,
   collections = [],
@@ -97,7 +97,7 @@ function Sidebar({
           >
             <span className="sidebar-item-icon">⭐</span>
             <span className="sidebar-item-name">Favorites</span>
-            <span className="sidebar-item-count">{Array.isArray(favorites) ? favorites.length : 0}</span>
+            <span className="sidebar-item-count">{favoritesCount}</span>
           </li>
         </ul>
       </div>